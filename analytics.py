@@ -0,0 +1,95 @@
+"""Candidate analytics, read only from rollup tables.
+
+job_stats, job_score_histogram and keyword_stats are kept current by
+triggers in schema.sql whenever a candidate is inserted, deleted or
+re-scored. The queries here read a handful of rows per job, so their cost
+does not grow with the number of candidates. rebuild() recomputes the
+rollups from scratch.
+"""
+
+from candidate_keywords import TIERS
+
+BUCKETS = 10
+
+
+def rebuild(conn):
+    """Recompute every rollup from candidates and candidate_keywords.
+
+    Job revisions keep increasing, so caches keyed by them stay valid.
+    """
+    with conn:
+        conn.execute("UPDATE job_stats SET candidates = 0, score_sum = 0, revision = revision + 1")
+        conn.execute(
+            """INSERT INTO job_stats (job_id, candidates, score_sum, revision)
+               SELECT job_id, COUNT(*), SUM(score), 1 FROM candidates
+               WHERE status = 'done' GROUP BY job_id
+               ON CONFLICT (job_id) DO UPDATE SET candidates = excluded.candidates,
+                   score_sum = excluded.score_sum"""
+        )
+        conn.execute("DELETE FROM job_score_histogram")
+        conn.execute(
+            """INSERT INTO job_score_histogram (job_id, bucket, count)
+               SELECT job_id, MIN(CAST(score / 10 AS INTEGER), 9), COUNT(*) FROM candidates
+               WHERE status = 'done' GROUP BY 1, 2"""
+        )
+        conn.execute("DELETE FROM keyword_stats")
+        conn.execute(
+            """INSERT INTO keyword_stats (job_id, keyword_id, tier, hits, misses)
+               SELECT c.job_id, ck.keyword_id, ck.tier, SUM(ck.matched), SUM(1 - ck.matched)
+               FROM candidate_keywords ck JOIN candidates c ON c.id = ck.candidate_id
+               GROUP BY 1, 2, 3"""
+        )
+
+
+def _coverage(hits, total):
+    return round(hits / total * 100, 1) if total else None
+
+
+def job_summaries(conn, job_id=None):
+    """{job_id: summary} with candidate count, average score, revision,
+    a 10-bucket score histogram and must-have / nice-to-have coverage (%).
+    """
+    where, params = ("WHERE job_id = ?", (job_id,)) if job_id else ("", ())
+    summaries = {}
+    for row in conn.execute(f"SELECT * FROM job_stats {where}", params):
+        count = row["candidates"]
+        summaries[row["job_id"]] = {
+            "job_id": row["job_id"],
+            "candidates": count,
+            "average_score": round(row["score_sum"] / count, 1) if count else None,
+            "revision": row["revision"],
+            "histogram": [0] * BUCKETS,
+            "coverage": {tier: None for tier in TIERS},
+        }
+    for row in conn.execute(f"SELECT * FROM job_score_histogram {where}", params):
+        if row["job_id"] in summaries:
+            summaries[row["job_id"]]["histogram"][row["bucket"]] = row["count"]
+    for row in conn.execute(
+        f"""SELECT job_id, tier, SUM(hits) AS hits, SUM(hits + misses) AS total
+            FROM keyword_stats {where} GROUP BY job_id, tier""",
+        params,
+    ):
+        if row["job_id"] in summaries:
+            summaries[row["job_id"]]["coverage"][TIERS[row["tier"]]] = _coverage(row["hits"], row["total"])
+    return summaries
+
+
+def keyword_breakdown(conn, job_id):
+    """Hit counts for each of a job's keywords, most often missing first."""
+    rows = conn.execute(
+        """SELECT k.keyword, ks.tier, ks.hits, ks.misses FROM keyword_stats ks
+           JOIN keywords k ON k.id = ks.keyword_id
+           WHERE ks.job_id = ? AND ks.hits + ks.misses > 0
+           ORDER BY ks.misses DESC, ks.tier, k.keyword""",
+        (job_id,),
+    )
+    return [
+        {
+            "keyword": row["keyword"],
+            "tier": TIERS[row["tier"]],
+            "hits": row["hits"],
+            "misses": row["misses"],
+            "hit_rate": _coverage(row["hits"], row["hits"] + row["misses"]),
+        }
+        for row in rows
+    ]
@@ -1,56 +1,144 @@
-import json
 import os
-import shutil
-import sqlite3
-from functools import wraps
+import threading
+import time
+from functools import lru_cache, wraps
 
 from flask import (
     Flask,
+    Request,
+    Response,
     flash,
+    g,
+    jsonify,
     redirect,
     render_template,
     request,
     send_from_directory,
     session,
+    stream_with_context,
     url_for,
 )
-from werkzeug.utils import secure_filename
 
+import analytics
+import candidate_keywords
+import db
+import export
+import extract_cache
+import metrics
+import rescore
+import scan_queue
+import score_matrix
+import search
+import upload_store
 from job_ads import get_job_ad, get_job_ads
-from scanner import highlight_keywords_in_text, scan_cv
+from scanner import generate_suggestions, highlight_keywords_in_text, highlight_terms
+
+
+class UploadRequest(Request):
+    """Streams uploaded files to disk in chunks, hashing them on the way."""
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return upload_store.HashingFile(app.config["UPLOAD_FOLDER"])
+
 
 app = Flask(__name__)
-app.config["UPLOAD_FOLDER"] = os.path.join(os.path.dirname(__file__), "uploads")
+app.request_class = UploadRequest
+app.config["UPLOAD_FOLDER"] = os.environ.get(
+    "ATS_UPLOAD_FOLDER", os.path.join(os.path.dirname(__file__), "uploads")
+)
 app.config["MAX_CONTENT_LENGTH"] = 5 * 1024 * 1024  # 5 MB limit
 app.secret_key = os.environ.get("SECRET_KEY", "dev-secret-key-change-me")
 
 ADMIN_PASSWORD = os.environ.get("ADMIN_PASSWORD", "01071988")
-DATABASE = os.path.join(os.path.dirname(__file__), "ats.db")
-
+DATABASE = db.DATABASE
+DASHBOARD_PAGE_SIZE = 50
+HIGHLIGHT_CACHE_SIZE = 128
+# Log requests slower than this with their per-stage breakdown; 0 disables
+SLOW_REQUEST_MS = float(os.environ.get("SLOW_REQUEST_MS", "1000"))
+
+REQUEST_METRIC = "http_request_duration_seconds"
+STAGE_METRIC = "request_stage_seconds"
+metrics.describe(REQUEST_METRIC, "Time to handle a request, by endpoint.")
+metrics.describe(STAGE_METRIC, "Time spent in stages of request handling.")
+metrics.describe("http_requests_total", "Requests handled, by endpoint and status.")
+metrics.describe("extract_cache_hits_total", "Extraction cache hits across all processes.")
+metrics.describe("extract_cache_misses_total", "Extraction cache misses across all processes.")
+metrics.describe("extract_cache_entries", "CV texts in the extraction cache.")
+metrics.describe("extract_cache_bytes", "Size of the cached CV texts in bytes.")
+
+
+def extract_cache_metrics():
+    stats = extract_cache.stats()
+    return {
+        "extract_cache_hits_total": stats["hits"],
+        "extract_cache_misses_total": stats["misses"],
+        "extract_cache_entries": stats["entries"],
+        "extract_cache_bytes": stats["bytes"],
+    }
+
+
+metrics.collector(
+    extract_cache_metrics, counters=("extract_cache_hits_total", "extract_cache_misses_total")
+)
 
-def parse_tiered_keywords(json_str):
-    """Parse a JSON string that may be a flat list (old) or a tiered dict (new).
 
-    Always returns {"must_have": [...], "nice_to_have": [...]}.
-    """
-    data = json.loads(json_str)
-    if isinstance(data, list):
-        return {"must_have": data, "nice_to_have": []}
-    return data
+def get_db():
+    """Pooled connection for the current app context, released on teardown."""
+    if "db" not in g:
+        g.db = db.get_pool(DATABASE).acquire()
+    return g.db
 
 
-def get_db():
-    conn = sqlite3.connect(DATABASE)
-    conn.row_factory = sqlite3.Row
-    return conn
+@app.teardown_appcontext
+def release_db(exc):
+    conn = g.pop("db", None)
+    if conn is not None:
+        db.get_pool(DATABASE).release(conn)
 
 
 def init_db():
-    with open(os.path.join(os.path.dirname(__file__), "schema.sql")) as f:
-        schema = f.read()
-    conn = get_db()
-    conn.executescript(schema)
-    conn.close()
+    db.init_db(DATABASE)
+
+
+@app.teardown_request
+def discard_incoming(exc):
+    # Uploads the view did not store (rejected forms, errors) are temp files
+    files = request.__dict__.get("files")
+    if files:
+        for _, storage in files.items(multi=True):
+            if isinstance(storage.stream, upload_store.HashingFile):
+                storage.stream.discard()
+
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+    metrics.start_trace()
+
+
+@app.after_request
+def record_request_time(response):
+    elapsed = time.perf_counter() - g.pop("request_started", time.perf_counter())
+    stages = metrics.end_trace()
+    endpoint = request.endpoint or "unknown"
+    metrics.observe(REQUEST_METRIC, elapsed, endpoint=endpoint)
+    metrics.inc("http_requests_total", endpoint=endpoint, status=response.status_code)
+    if SLOW_REQUEST_MS and elapsed * 1000 >= SLOW_REQUEST_MS:
+        breakdown = ", ".join(f"{stage}={seconds * 1000:.1f}ms" for stage, seconds in stages)
+        app.logger.warning(
+            "Slow request %s %s took %.1fms (%s)",
+            request.method, request.path, elapsed * 1000, breakdown or "no stages timed",
+        )
+    return response
+
+
+def parse_cursor(value):
+    """Parse a dashboard "score:id" page cursor; None if missing or malformed."""
+    score, _, candidate_id = value.partition(":")
+    try:
+        return float(score), int(candidate_id)
+    except ValueError:
+        return None
 
 
 def admin_required(f):
@@ -90,43 +178,20 @@ def submit():
         flash("Invalid job selection.", "error")
         return redirect(url_for("index"))
 
-    # Save the PDF
-    filename = secure_filename(pdf_file.filename)
-    os.makedirs(app.config["UPLOAD_FOLDER"], exist_ok=True)
-    # Add uniqueness to avoid overwrites
-    base, ext = os.path.splitext(filename)
-    import time
-    unique_filename = f"{base}_{int(time.time())}{ext}"
-    pdf_path = os.path.join(app.config["UPLOAD_FOLDER"], unique_filename)
-    pdf_file.save(pdf_path)
-
-    # Scan the CV
-    try:
-        result = scan_cv(pdf_path, job_ad["keywords"])
-    except Exception as e:
-        flash(f"Error processing PDF: {e}", "error")
-        return redirect(url_for("index"))
-
-    # Store in database (matched/missing stored as tiered dicts)
+    # The body was already streamed to a temp file and hashed while parsing;
+    # store it under its content hash, reusing an identical earlier upload
     conn = get_db()
-    cursor = conn.execute(
-        """INSERT INTO candidates (name, job_id, pdf_filename, cv_text, score,
-           matched_keywords, missing_keywords, suggestions)
-           VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
-        (
-            name,
-            job_id,
-            unique_filename,
-            result["cv_text"],
-            result["score"],
-            json.dumps(result["matched_keywords"]),
-            json.dumps(result["missing_keywords"]),
-            json.dumps(result["suggestions"]),
-        ),
-    )
-    conn.commit()
-    candidate_id = cursor.lastrowid
-    conn.close()
+    with metrics.timed(STAGE_METRIC, stage="upload_store"):
+        filename = upload_store.place(conn, pdf_file.stream, app.config["UPLOAD_FOLDER"])
+    pdf_path = os.path.join(app.config["UPLOAD_FOLDER"], filename)
+
+    # Record a pending candidate (same transaction) and scan in the background
+    with metrics.timed(STAGE_METRIC, stage="db_insert"):
+        candidate_id = scan_queue.create_pending(conn, name, job_id, filename)
+    with metrics.timed(STAGE_METRIC, stage="enqueue"):
+        scan_queue.enqueue(
+            candidate_id, pdf_path, job_ad["keywords"], DATABASE, score_matrix.all_job_keywords()
+        )
 
     return redirect(url_for("results", candidate_id=candidate_id))
 
@@ -137,26 +202,39 @@ def results(candidate_id):
     candidate = conn.execute(
         "SELECT * FROM candidates WHERE id = ?", (candidate_id,)
     ).fetchone()
-    conn.close()
 
     if not candidate:
         flash("Candidate not found.", "error")
         return redirect(url_for("index"))
 
+    if candidate["status"] == scan_queue.STATUS_PENDING:
+        return render_template("results_pending.html", candidate=candidate)
+
+    if candidate["status"] == scan_queue.STATUS_FAILED:
+        flash(f"Error processing PDF: {candidate['error']}", "error")
+        return redirect(url_for("index"))
+
     job_ad = get_job_ad(candidate["job_id"])
-    matched = parse_tiered_keywords(candidate["matched_keywords"])
-    missing = parse_tiered_keywords(candidate["missing_keywords"])
+    matched, missing = candidate_keywords.load(conn, candidate_id)
+    best_roles = score_matrix.for_candidate(conn, candidate_id)[:score_matrix.BEST_MATCHES]
 
     return render_template(
         "results.html",
         candidate=candidate,
         job_ad=job_ad,
+        job_ads=get_job_ads(),
         matched=matched,
         missing=missing,
-        suggestions=json.loads(candidate["suggestions"]),
+        suggestions=generate_suggestions(missing["must_have"], missing["nice_to_have"]),
+        best_roles=best_roles,
     )
 
 
+@app.route("/metrics")
+def metrics_endpoint():
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+
 # --- Admin Routes ---
 
 
@@ -179,25 +257,193 @@ def admin_login():
 @admin_required
 def admin_dashboard():
     job_filter = request.args.get("job", "all")
+    keyword = request.args.get("keyword", "").strip()
+    cursor = parse_cursor(request.args.get("after", ""))
+    start = request.args.get("start", 0, type=int)
     conn = get_db()
 
+    # Keyset pagination over (score, id), served by the score indexes
+    where = []
+    params = []
     if job_filter != "all":
-        candidates = conn.execute(
-            "SELECT * FROM candidates WHERE job_id = ? ORDER BY score DESC",
-            (job_filter,),
-        ).fetchall()
-    else:
-        candidates = conn.execute(
-            "SELECT * FROM candidates ORDER BY score DESC"
-        ).fetchall()
+        where.append("job_id = ?")
+        params.append(job_filter)
+    if keyword:
+        where.append(f"id IN ({candidate_keywords.MATCHED_SQL})")
+        params.append(keyword)
+    if cursor:
+        where.append("(score, id) < (?, ?)")
+        params.extend(cursor)
+    sql = "SELECT id, name, job_id, score, created_at, status, error FROM candidates"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += " ORDER BY score DESC, id DESC LIMIT ?"
+    params.append(DASHBOARD_PAGE_SIZE + 1)
+    candidates = conn.execute(sql, params).fetchall()
+
+    next_cursor = None
+    if len(candidates) > DASHBOARD_PAGE_SIZE:
+        candidates = candidates[:DASHBOARD_PAGE_SIZE]
+        last = candidates[-1]
+        next_cursor = f"{last['score']}:{last['id']}"
 
-    conn.close()
     job_ads = get_job_ads()
+    stale = sum(rescore.stale_counts(conn, job_ads).values())
+    best_jobs = score_matrix.best_jobs(conn, [c["id"] for c in candidates])
     return render_template(
         "admin_dashboard.html",
         candidates=candidates,
+        best_jobs=best_jobs,
         job_ads=job_ads,
         current_filter=job_filter,
+        keyword=keyword,
+        stale_count=stale,
+        start=start,
+        is_first_page=cursor is None,
+        next_cursor=next_cursor,
+    )
+
+
+@app.route("/admin/search")
+@admin_required
+def admin_search():
+    query = request.args.get("q", "").strip()
+    job_filter = request.args.get("job", "all")
+    page = max(request.args.get("page", 1, type=int), 1)
+
+    results, has_next = [], False
+    if query:
+        try:
+            results, has_next = search.search_candidates(
+                get_db(), query, None if job_filter == "all" else job_filter, page
+            )
+        except search.SearchError:
+            flash("Could not understand that search. Try plain words, AND / OR / NOT, or \"quoted phrases\".", "error")
+
+    return render_template(
+        "admin_search.html",
+        query=query,
+        results=results,
+        job_ads=get_job_ads(),
+        current_filter=job_filter,
+        page=page,
+        has_next=has_next,
+    )
+
+
+@app.route("/admin/analytics")
+@admin_required
+def admin_analytics():
+    job_filter = request.args.get("job")
+    conn = get_db()
+    job_ads = get_job_ads()
+    summaries = analytics.job_summaries(conn)
+    selected = summaries.get(job_filter)
+    return render_template(
+        "admin_analytics.html",
+        job_ads=job_ads,
+        summaries=summaries,
+        selected=selected,
+        keywords=analytics.keyword_breakdown(conn, job_filter) if selected else [],
+    )
+
+
+@app.route("/admin/api/analytics")
+@admin_required
+def admin_api_analytics():
+    return jsonify({"jobs": list(analytics.job_summaries(get_db()).values())})
+
+
+@app.route("/admin/api/analytics/<job_id>")
+@admin_required
+def admin_api_job_analytics(job_id):
+    conn = get_db()
+    summary = analytics.job_summaries(conn, job_id).get(job_id)
+    if summary is None:
+        return jsonify({"error": f"No analytics for job {job_id!r}"}), 404
+    return jsonify(dict(summary, keywords=analytics.keyword_breakdown(conn, job_id)))
+
+
+def ranking_args():
+    """Keyword weight overrides ("w.<keyword>" params) and top-k from the query string."""
+    import batch_scoring
+
+    overrides = {}
+    for name, value in request.args.items():
+        if name.startswith("w.") and value.strip():
+            overrides[name[2:]] = float(value)
+    top = min(max(request.args.get("top", batch_scoring.TOP_K, type=int), 1), 1000)
+    return overrides, top
+
+
+@app.route("/admin/ranking")
+@admin_required
+def admin_ranking():
+    # Imported here so workers that never rank do not load numpy
+    import batch_scoring
+
+    job_ads = get_job_ads()
+    job_filter = request.args.get("job")
+    if job_filter not in job_ads:
+        job_filter = next(iter(job_ads), None)
+    result = None
+    if job_filter:
+        try:
+            overrides, top = ranking_args()
+            result = batch_scoring.rank(get_db(), job_filter, job_ads[job_filter]["keywords"], overrides, k=top)
+        except ValueError:
+            flash("Weights must be numbers of 0 or more.", "error")
+            result = batch_scoring.rank(get_db(), job_filter, job_ads[job_filter]["keywords"])
+    return render_template(
+        "admin_ranking.html",
+        job_ads=job_ads,
+        current_filter=job_filter,
+        result=result,
+    )
+
+
+@app.route("/admin/api/ranking/<job_id>")
+@admin_required
+def admin_api_ranking(job_id):
+    import batch_scoring
+
+    job_ad = get_job_ad(job_id)
+    if job_ad is None:
+        return jsonify({"error": f"Unknown job {job_id!r}"}), 404
+    try:
+        overrides, top = ranking_args()
+        result = batch_scoring.rank(get_db(), job_id, job_ad["keywords"], overrides, k=top)
+    except ValueError:
+        return jsonify({"error": "Weights must be numbers of 0 or more"}), 400
+    return jsonify(dict(result, job_id=job_id))
+
+
+@app.route("/admin/export")
+@admin_required
+def admin_export():
+    fmt = request.args.get("format", "csv")
+    if fmt not in export.FORMATS:
+        flash(f"Unknown export format {fmt!r}.", "error")
+        return redirect(url_for("admin_dashboard"))
+    job_filter = request.args.get("job", "all")
+    job_id = None if job_filter == "all" else job_filter
+    min_score = request.args.get("min_score", type=float)
+    max_score = request.args.get("max_score", type=float)
+    include_cv_text = request.args.get("cv_text") == "1"
+
+    def generate():
+        # A connection of its own, held only while the body is being sent
+        conn = db.connect(DATABASE)
+        try:
+            yield from export.export(conn, fmt, job_id, min_score, max_score, include_cv_text)
+        finally:
+            conn.close()
+
+    filename = f"candidates-{job_filter}-{time.strftime('%Y%m%d')}.{fmt}"
+    return Response(
+        stream_with_context(generate()),
+        mimetype=export.FORMATS[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
     )
 
 
@@ -205,31 +451,52 @@ def admin_dashboard():
 @admin_required
 def admin_candidate(candidate_id):
     conn = get_db()
+    # cv_text is only loaded when the highlighted view is not cached yet
     candidate = conn.execute(
-        "SELECT * FROM candidates WHERE id = ?", (candidate_id,)
+        """SELECT id, name, job_id, score, status, extraction_partial, created_at
+           FROM candidates WHERE id = ?""",
+        (candidate_id,),
     ).fetchone()
-    conn.close()
 
     if not candidate:
         flash("Candidate not found.", "error")
         return redirect(url_for("admin_dashboard"))
 
     job_ad = get_job_ad(candidate["job_id"])
-    matched = parse_tiered_keywords(candidate["matched_keywords"])
-    missing = parse_tiered_keywords(candidate["missing_keywords"])
-    all_matched = matched["must_have"] + matched["nice_to_have"]
-    highlighted_text = highlight_keywords_in_text(candidate["cv_text"], all_matched)
+    matched, missing = candidate_keywords.load(conn, candidate_id)
+    terms, whole_words = highlight_terms(
+        job_ad["keywords"] if job_ad else [], matched["must_have"] + matched["nice_to_have"]
+    )
+    if candidate["status"] == scan_queue.STATUS_DONE:
+        highlighted_text = highlighted_cv_text(candidate_id, terms, whole_words)
+    else:
+        highlighted_text = ""
 
     return render_template(
         "admin_candidate.html",
         candidate=candidate,
         job_ad=job_ad,
+        job_ads=get_job_ads(),
+        job_scores=score_matrix.for_candidate(conn, candidate_id),
         matched=matched,
         missing=missing,
         highlighted_text=highlighted_text,
     )
 
 
+@lru_cache(maxsize=HIGHLIGHT_CACHE_SIZE)
+def highlighted_cv_text(candidate_id, matched_keywords, whole_words=False):
+    """Highlighted CV HTML, cached per (candidate, matched keyword set, mode).
+
+    Candidate ids are never reused and cv_text never changes once a scan is
+    done, so entries only go stale when candidates are deleted.
+    """
+    row = get_db().execute(
+        "SELECT cv_text FROM candidates WHERE id = ?", (candidate_id,)
+    ).fetchone()
+    return highlight_keywords_in_text(row["cv_text"], matched_keywords, whole_words)
+
+
 @app.route("/admin/pdf/<int:candidate_id>")
 @admin_required
 def admin_pdf(candidate_id):
@@ -237,7 +504,6 @@ def admin_pdf(candidate_id):
     candidate = conn.execute(
         "SELECT pdf_filename FROM candidates WHERE id = ?", (candidate_id,)
     ).fetchone()
-    conn.close()
 
     if not candidate:
         flash("Candidate not found.", "error")
@@ -252,25 +518,82 @@ def admin_delete_all():
     conn = get_db()
     conn.execute("DELETE FROM candidates")
     conn.commit()
-    conn.close()
+    highlighted_cv_text.cache_clear()
 
-    # Clear uploads folder
-    upload_dir = app.config["UPLOAD_FOLDER"]
-    if os.path.exists(upload_dir):
-        shutil.rmtree(upload_dir)
-    os.makedirs(upload_dir, exist_ok=True)
+    # Candidate triggers dropped every refcount to zero; remove those files
+    upload_store.collect_garbage(conn, app.config["UPLOAD_FOLDER"])
 
     flash("All candidate data has been deleted.", "success")
     return redirect(url_for("admin_dashboard"))
 
 
+@app.route("/admin/candidate/<int:candidate_id>/delete", methods=["POST"])
+@admin_required
+def admin_delete_candidate(candidate_id):
+    conn = get_db()
+    deleted = conn.execute("DELETE FROM candidates WHERE id = ?", (candidate_id,)).rowcount
+    conn.commit()
+    if not deleted:
+        flash("Candidate not found.", "error")
+        return redirect(url_for("admin_dashboard"))
+    highlighted_cv_text.cache_clear()
+
+    # The PDF is only removed if no other candidate uploaded the same file
+    upload_store.collect_garbage(conn, app.config["UPLOAD_FOLDER"])
+
+    flash("Candidate deleted.", "success")
+    return redirect(url_for("admin_dashboard"))
+
+
+# Held while a background re-score runs in this process
+_rescore_lock = threading.Lock()
+
+
+def run_rescore():
+    """Re-score stale candidates and backfill the score matrix on its own connection."""
+    conn = db.connect(DATABASE)
+    try:
+        started = time.monotonic()
+        rescored, backfilled = rescore.rescore_and_backfill(conn)
+        app.logger.info(
+            "Re-scored %d candidates and refreshed all-job scores for %d in %.1fs",
+            sum(rescored.values()), backfilled, time.monotonic() - started,
+        )
+    except Exception:
+        app.logger.exception("Background re-score failed")
+    finally:
+        conn.close()
+        _rescore_lock.release()
+
+
+@app.route("/admin/rescore", methods=["POST"])
+@admin_required
+def admin_rescore():
+    # Tens of thousands of CVs take minutes, far past any request timeout;
+    # each batch commits, so the dashboard count drops as it goes
+    if not _rescore_lock.acquire(blocking=False):
+        flash("A re-score is already running.", "error")
+    else:
+        threading.Thread(target=run_rescore, name="rescore", daemon=True).start()
+        flash("Re-scoring outdated candidates in the background.", "success")
+    return redirect(url_for("admin_dashboard"))
+
+
 @app.route("/admin/logout")
 def admin_logout():
     session.pop("admin", None)
     return redirect(url_for("index"))
 
 
+# Migrate the schema once per process, before the first request
+init_db()
+os.makedirs(app.config["UPLOAD_FOLDER"], exist_ok=True)
+
+
 if __name__ == "__main__":
-    init_db()
-    os.makedirs(app.config["UPLOAD_FOLDER"], exist_ok=True)
+    # With the debug reloader, only the serving child process owns the queue
+    if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        scan_queue.resume_pending(
+            app.config["UPLOAD_FOLDER"], get_job_ad, DATABASE, score_matrix.all_job_keywords()
+        )
     app.run(debug=True, port=5000)
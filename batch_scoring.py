@@ -0,0 +1,246 @@
+"""Vectorized scoring of a job's stored candidates, for what-if ranking.
+
+    python batch_scoring.py backend --top 20
+    python batch_scoring.py backend --weight docker=5 --weight "rest api"=0
+
+A job's finished candidates are loaded from candidate_keywords into a
+candidate x keyword hit matrix. Scoring every candidate is then one
+matrix-vector product with a weight per keyword, so recruiters can change
+weights and re-rank tens of thousands of CVs without a Python loop per row.
+With the default weights (tier weights from scanner) the scores equal the
+stored ones for candidates scored against the current keywords.
+
+Matrices are cached per job and rebuilt when the job's analytics revision
+(bumped by every insert, re-score and delete) or its keyword list changes.
+"""
+
+import argparse
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+import db
+from candidate_keywords import TIERS
+from job_ads import get_job_ads
+from matcher import keywords_fingerprint, split_tiers
+from scanner import MUST_HAVE_WEIGHT, NICE_TO_HAVE_WEIGHT
+
+TIER_WEIGHTS = {"must_have": MUST_HAVE_WEIGHT, "nice_to_have": NICE_TO_HAVE_WEIGHT}
+TOP_K = 50
+# Roughly 40 bytes per candidate per job with the usual keyword counts
+MAX_CACHED_JOBS = 16
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+class HitMatrix:
+    """Which of a job's keywords each finished candidate matched.
+
+    Rows are candidates, newest first; columns are the job's keywords as
+    (keyword, tier) pairs, must-haves first, in the job's order.
+    """
+
+    def __init__(self, candidate_ids, stored_scores, columns, hits):
+        self.candidate_ids = candidate_ids
+        self.stored_scores = stored_scores
+        self.columns = columns
+        self.hits = hits
+        # Position on the dashboard (score desc, id desc); rows are id desc
+        order = np.lexsort((np.arange(len(candidate_ids)), -stored_scores))
+        self.stored_ranks = np.empty(len(candidate_ids), dtype=np.int64)
+        self.stored_ranks[order] = np.arange(1, len(candidate_ids) + 1)
+
+    def __len__(self):
+        return len(self.candidate_ids)
+
+    def weights(self, overrides=None, tier_weights=None):
+        """Weight vector: tier weights, replaced per keyword by overrides.
+
+        overrides is {keyword: weight}; a weight of 0 ignores the keyword.
+        """
+        tier_weights = dict(TIER_WEIGHTS, **(tier_weights or {}))
+        overrides = overrides or {}
+        weights = np.array(
+            [overrides.get(kw, tier_weights[tier]) for kw, tier in self.columns], dtype=np.float64
+        )
+        if not np.isfinite(weights).all() or (weights < 0).any():
+            raise ValueError("Keyword weights must be numbers of 0 or more")
+        return weights
+
+    def scores(self, weights):
+        """Weighted score (%) of every candidate, unrounded."""
+        maximum = weights.sum()
+        if maximum == 0 or not len(self):
+            return np.zeros(len(self))
+        return self.hits @ weights.astype(np.float32) / maximum * 100
+
+    def top(self, scores, k=TOP_K):
+        """Row indices of the k best scores, ordered like the dashboard."""
+        n = len(scores)
+        k = min(k, n)
+        if k <= 0:
+            return np.empty(0, dtype=np.int64)
+        # Everything above the k-th best score, then ties in row (id desc) order
+        kth = np.partition(scores, n - k)[n - k]
+        above = np.flatnonzero(scores > kth)
+        ties = np.flatnonzero(scores == kth)[:k - len(above)]
+        rows = np.concatenate([above, ties])
+        return rows[np.lexsort((rows, -scores[rows]))]
+
+
+def _columns(job_keywords):
+    must_have, nice_to_have = split_tiers(job_keywords)
+    return [(kw, "must_have") for kw in must_have] + [(kw, "nice_to_have") for kw in nice_to_have]
+
+
+def build(conn, job_id, job_keywords):
+    """Load a job's finished candidates into a HitMatrix (uncached)."""
+    columns = _columns(job_keywords)
+    keyword_ids = dict(conn.execute(
+        f"SELECT keyword, id FROM keywords WHERE keyword IN ({','.join('?' * len(columns))})",
+        [kw for kw, _ in columns],
+    )) if columns else {}
+
+    # One statement, so candidates and their hits come from the same snapshot
+    cursor = conn.cursor()
+    cursor.row_factory = None
+    rows = cursor.execute(
+        """SELECT c.id, c.score, COALESCE(ck.tier, -1), COALESCE(ck.keyword_id, -1)
+           FROM candidates c
+           LEFT JOIN candidate_keywords ck ON ck.candidate_id = c.id AND ck.matched = 1
+           WHERE c.job_id = ? AND c.status = 'done'""",
+        (job_id,),
+    ).fetchall()
+    data = np.array(rows, dtype=np.float64).reshape(-1, 4)
+
+    # Unique candidate ids, newest first, and the row each hit belongs to
+    negated, first, row_of = np.unique(-data[:, 0], return_index=True, return_inverse=True)
+    candidate_ids = (-negated).astype(np.int64)
+    stored_scores = data[first, 1]
+
+    # (keyword_id, tier) pairs encoded as one integer, mapped to their column
+    keys = data[:, 3].astype(np.int64) * len(TIERS) + data[:, 2].astype(np.int64)
+    column_keys = np.array([
+        keyword_ids.get(kw, -1) * len(TIERS) + TIERS.index(tier) for kw, tier in columns
+    ], dtype=np.int64)
+    lookup = np.full(max(keys.max(initial=0), column_keys.max(initial=0)) + 1, -1, dtype=np.int64)
+    known = column_keys >= 0
+    # Reversed so a keyword listed twice maps to its first column
+    lookup[column_keys[known][::-1]] = np.flatnonzero(known)[::-1]
+    column_of = np.where(keys >= 0, lookup[np.maximum(keys, 0)], -1)
+
+    hits = np.zeros((len(candidate_ids), len(columns)), dtype=np.float32)
+    hit = column_of >= 0
+    hits[row_of[hit], column_of[hit]] = 1
+    for index, key in enumerate(column_keys):
+        first_column = lookup[key] if key >= 0 else index
+        if first_column != index:
+            hits[:, index] = hits[:, first_column]
+    return HitMatrix(candidate_ids, stored_scores, columns, hits)
+
+
+def _database(conn):
+    return conn.execute("PRAGMA database_list").fetchone()["file"]
+
+
+def get_matrix(conn, job_id, job_keywords):
+    """The cached HitMatrix for a job, rebuilt if candidates or keywords changed."""
+    row = conn.execute("SELECT revision FROM job_stats WHERE job_id = ?", (job_id,)).fetchone()
+    stamp = (row["revision"] if row else 0, keywords_fingerprint(job_keywords))
+    key = (_database(conn), job_id)
+    with _cache_lock:
+        cached = _cache.get(key)
+        if cached and cached[0] == stamp:
+            _cache.move_to_end(key)
+            return cached[1]
+    matrix = build(conn, job_id, job_keywords)
+    with _cache_lock:
+        _cache[key] = (stamp, matrix)
+        _cache.move_to_end(key)
+        while len(_cache) > MAX_CACHED_JOBS:
+            _cache.popitem(last=False)
+    return matrix
+
+
+def rank(conn, job_id, job_keywords, overrides=None, tier_weights=None, k=TOP_K):
+    """Top-k candidates for a job under the given keyword weights.
+
+    Returns {candidates, weights, ranking}; each ranking entry has the
+    candidate id, name, what-if score and the stored score and rank.
+    """
+    matrix = get_matrix(conn, job_id, job_keywords)
+    weights = matrix.weights(overrides, tier_weights)
+    scores = matrix.scores(weights)
+    top = matrix.top(scores, k)
+    ids = matrix.candidate_ids[top].tolist()
+    names = dict(conn.execute(
+        f"SELECT id, name FROM candidates WHERE id IN ({','.join('?' * len(ids))})", ids
+    )) if ids else {}
+    return {
+        "candidates": len(matrix),
+        "weights": [
+            {"keyword": kw, "tier": tier, "weight": float(weight)}
+            for (kw, tier), weight in zip(matrix.columns, weights)
+        ],
+        "ranking": [
+            {
+                "rank": position,
+                "id": candidate_id,
+                "name": names.get(candidate_id),
+                "score": round(float(score), 1),
+                "stored_score": float(stored_score),
+                "stored_rank": int(stored_rank),
+            }
+            for position, candidate_id, score, stored_score, stored_rank in zip(
+                range(1, len(ids) + 1), ids, scores[top],
+                matrix.stored_scores[top], matrix.stored_ranks[top],
+            )
+        ],
+    }
+
+
+def parse_weight(value):
+    """'keyword=weight' -> (keyword, float weight)."""
+    keyword, sep, weight = value.rpartition("=")
+    if not sep or not keyword.strip():
+        raise ValueError(f"Expected keyword=weight, got {value!r}")
+    return keyword.strip(), float(weight)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Rank a job's candidates under custom keyword weights.")
+    parser.add_argument("job", help="job ad id")
+    parser.add_argument("--weight", action="append", default=[], metavar="KEYWORD=WEIGHT",
+                        help="override one keyword's weight (repeatable)")
+    parser.add_argument("--must-have", type=float, default=MUST_HAVE_WEIGHT, help="must-have tier weight")
+    parser.add_argument("--nice-to-have", type=float, default=NICE_TO_HAVE_WEIGHT,
+                        help="nice-to-have tier weight")
+    parser.add_argument("--top", type=int, default=TOP_K, help="number of candidates to show")
+    parser.add_argument("--db", default=None, help="SQLite database path")
+    args = parser.parse_args(argv)
+
+    db.init_db(args.db)
+    job_ads = get_job_ads(args.db)
+    if args.job not in job_ads:
+        parser.error(f"unknown job {args.job!r}")
+    try:
+        overrides = dict(parse_weight(value) for value in args.weight)
+    except ValueError as e:
+        parser.error(str(e))
+
+    conn = db.connect(args.db)
+    result = rank(
+        conn, args.job, job_ads[args.job]["keywords"], overrides,
+        {"must_have": args.must_have, "nice_to_have": args.nice_to_have}, args.top,
+    )
+    conn.close()
+    print(f"{result['candidates']} candidates")
+    for entry in result["ranking"]:
+        print(f"{entry['rank']:>4}  {entry['score']:>5.1f}%  (was #{entry['stored_rank']}, "
+              f"{entry['stored_score']:.1f}%)  {entry['id']}  {entry['name']}")
+
+
+if __name__ == "__main__":
+    main()
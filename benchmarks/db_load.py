@@ -0,0 +1,107 @@
+"""Concurrent read/write load against the SQLite layer.
+
+    python benchmarks/db_load.py --readers 8 --writers 2 --seconds 5
+    python benchmarks/db_load.py --legacy   # fresh connection per operation, rollback journal
+
+Readers run the dashboard page query, writers insert candidate rows. Each
+run uses a throwaway database and reports operations per second and how many
+operations failed with "database is locked".
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db  # noqa: E402
+
+READ_SQL = (
+    "SELECT id, name, job_id, score, created_at, status, error FROM candidates "
+    "ORDER BY score DESC, id DESC LIMIT 51"
+)
+WRITE_SQL = (
+    "INSERT INTO candidates (name, job_id, pdf_filename, cv_text, score) "
+    "VALUES (?, ?, ?, ?, ?)"
+)
+
+
+def legacy_connect(path):
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def worker(kind, path, legacy, deadline, counts, lock, seq):
+    pool = db.get_pool(path)
+    done = locked = 0
+    cv_text = "lorem ipsum " * 400
+    while time.monotonic() < deadline:
+        conn = legacy_connect(path) if legacy else pool.acquire()
+        try:
+            if kind == "read":
+                conn.execute(READ_SQL).fetchall()
+            else:
+                conn.execute(WRITE_SQL, (f"bench {seq}", "fullstack", "bench.pdf", cv_text,
+                                         (done * 7) % 100))
+                conn.commit()
+            done += 1
+        except sqlite3.OperationalError as e:
+            if "locked" not in str(e):
+                raise
+            locked += 1
+        finally:
+            if legacy:
+                conn.close()
+            else:
+                pool.release(conn)
+    with lock:
+        counts[kind] += done
+        counts[kind + "_locked"] += locked
+
+
+def run(readers, writers, seconds, legacy):
+    tmp = tempfile.mkdtemp()
+    path = os.path.join(tmp, "bench.db")
+    db.init_db(path)
+    if legacy:
+        conn = sqlite3.connect(path)
+        conn.execute("PRAGMA journal_mode = DELETE")
+        conn.close()
+
+    counts = {"read": 0, "write": 0, "read_locked": 0, "write_locked": 0}
+    lock = threading.Lock()
+    deadline = time.monotonic() + seconds
+    threads = [
+        threading.Thread(target=worker, args=(kind, path, legacy, deadline, counts, lock, i))
+        for i, kind in enumerate(["read"] * readers + ["write"] * writers)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="SQLite read/write throughput under concurrency.")
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--writers", type=int, default=2)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--legacy", action="store_true",
+                        help="open a new connection per operation with the rollback journal")
+    args = parser.parse_args(argv)
+
+    counts = run(args.readers, args.writers, args.seconds, args.legacy)
+    mode = "legacy" if args.legacy else "pooled+WAL"
+    print(f"{mode}: {args.readers} readers, {args.writers} writers, {args.seconds:.0f}s")
+    print(f"  reads/s:  {counts['read'] / args.seconds:10.1f}  (locked: {counts['read_locked']})")
+    print(f"  writes/s: {counts['write'] / args.seconds:10.1f}  (locked: {counts['write_locked']})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+"""HTTP load test: requests per second for /, /submit and /admin/dashboard.
+
+    python benchmarks/load_test.py --serve --workers 4           # start serve.py on a throwaway database
+    python benchmarks/load_test.py --url http://127.0.0.1:8000 --concurrency 16 --seconds 10
+
+Each endpoint is driven in turn by --concurrency client threads for
+--seconds, and the report gives requests per second, median and p95
+latency, and failed requests. /submit uploads a synthetic CV (see
+synthetic_pdf.py), so it also feeds the scan pool; /admin/dashboard logs in
+first. With --serve the server runs on a free port with a fresh database,
+extraction cache and uploads folder in a temporary directory, and is
+stopped (SIGTERM) afterwards.
+"""
+
+import argparse
+import http.cookiejar
+import os
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from synthetic_pdf import make_cv_pdf  # noqa: E402
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ENDPOINTS = ("/", "/submit", "/admin/dashboard")
+
+
+def multipart(fields, files):
+    """(body, content type) for a multipart/form-data POST."""
+    boundary = uuid.uuid4().hex
+    parts = []
+    for name, value in fields.items():
+        parts.append(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode()
+        )
+    for name, (filename, data) in files.items():
+        parts.append(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+            f"Content-Type: application/pdf\r\n\r\n".encode() + data + b"\r\n"
+        )
+    parts.append(f"--{boundary}--\r\n".encode())
+    return b"".join(parts), f"multipart/form-data; boundary={boundary}"
+
+
+def client(base_url, password):
+    """An opener with its own cookie jar, logged in as admin."""
+    opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()))
+    opener.open(f"{base_url}/admin", urllib.parse.urlencode({"password": password}).encode(), timeout=30)
+    return opener
+
+
+def make_request(endpoint, base_url, job_id, pdf):
+    if endpoint != "/submit":
+        return urllib.request.Request(base_url + endpoint)
+    body, content_type = multipart({"name": "Load Test", "job_id": job_id}, {"pdf": ("cv.pdf", pdf)})
+    return urllib.request.Request(base_url + endpoint, body, {"Content-Type": content_type})
+
+
+def drive(endpoint, base_url, password, job_id, pdf, concurrency, seconds):
+    """Hit one endpoint from `concurrency` threads; returns (latencies, errors)."""
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    deadline = time.monotonic() + seconds
+
+    def run():
+        opener = client(base_url, password)
+        mine = []
+        failed = 0
+        while time.monotonic() < deadline:
+            started = time.perf_counter()
+            try:
+                with opener.open(make_request(endpoint, base_url, job_id, pdf), timeout=30) as response:
+                    response.read()
+            except (urllib.error.URLError, OSError):
+                failed += 1
+                continue
+            mine.append(time.perf_counter() - started)
+        with lock:
+            latencies.extend(mine)
+            errors[0] += failed
+
+    threads = [threading.Thread(target=run) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, errors[0]
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(workers, workdir):
+    port = free_port()
+    env = dict(
+        os.environ,
+        ATS_DATABASE=os.path.join(workdir, "ats.db"),
+        ATS_EXTRACT_CACHE=os.path.join(workdir, "extract_cache.db"),
+        ATS_UPLOAD_FOLDER=os.path.join(workdir, "uploads"),
+    )
+    process = subprocess.Popen(
+        [sys.executable, os.path.join(ROOT, "serve.py"), "--port", str(port), "--workers", str(workers)],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    for _ in range(100):
+        try:
+            urllib.request.urlopen(base_url + "/", timeout=1).read()
+            return process, base_url
+        except (urllib.error.URLError, OSError):
+            time.sleep(0.1)
+    process.kill()
+    sys.exit("server did not start")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Requests per second against a running server.")
+    parser.add_argument("--url", default="http://127.0.0.1:8000", help="server base URL")
+    parser.add_argument("--serve", action="store_true", help="start serve.py on a throwaway database")
+    parser.add_argument("--workers", type=int, default=4, help="serve.py workers (with --serve)")
+    parser.add_argument("--concurrency", type=int, default=8, help="client threads per endpoint")
+    parser.add_argument("--seconds", type=float, default=5.0, help="duration per endpoint")
+    parser.add_argument("--endpoints", default=",".join(ENDPOINTS), help="comma-separated paths")
+    parser.add_argument("--job", default="fullstack", help="job id used for /submit")
+    parser.add_argument("--password", default=os.environ.get("ADMIN_PASSWORD", "01071988"))
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        pdf_path = os.path.join(workdir, "cv.pdf")
+        make_cv_pdf(pdf_path, pages=2, keywords=["python", "react", "go"])
+        with open(pdf_path, "rb") as f:
+            pdf = f.read()
+
+        process = None
+        base_url = args.url.rstrip("/")
+        if args.serve:
+            process, base_url = start_server(args.workers, workdir)
+        try:
+            print(f"{base_url}: {args.concurrency} clients, {args.seconds:.0f}s per endpoint")
+            for endpoint in args.endpoints.split(","):
+                latencies, errors = drive(
+                    endpoint, base_url, args.password, args.job, pdf, args.concurrency, args.seconds
+                )
+                latencies.sort()
+                p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] if latencies else 0
+                median = statistics.median(latencies) if latencies else 0
+                print(f"  {endpoint:<18} {len(latencies) / args.seconds:8.1f} req/s   "
+                      f"median {median * 1000:7.1f} ms   p95 {p95 * 1000:7.1f} ms   errors {errors}")
+        finally:
+            if process:
+                process.send_signal(signal.SIGTERM)
+                process.wait(timeout=60)
+
+
+if __name__ == "__main__":
+    main()
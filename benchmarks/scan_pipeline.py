@@ -0,0 +1,235 @@
+"""Per-stage timing and memory benchmark for the CV scan pipeline.
+
+    python benchmarks/scan_pipeline.py                          # print a report
+    python benchmarks/scan_pipeline.py --output baseline.json   # save it
+    python benchmarks/scan_pipeline.py --baseline baseline.json # fail on regressions
+
+Each scenario generates a synthetic CV (see synthetic_pdf.py) and times the
+stages separately: extraction, normalization, matcher compilation, keyword
+matching (plain substring, and token matching with every matching option
+on), scoring, highlighting and the end-to-end scan_cv. Token matching must
+keep its p95 within --match-budget times the substring matcher's; its
+near-term and stem memos are cleared before every run, so it is measured
+cold, as on a CV the matcher has not seen. Peak traced
+memory is measured in a separate run of each stage so it does not skew the
+timings. The extraction cache is disabled throughout.
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import extract_cache  # noqa: E402
+import matcher  # noqa: E402
+from extraction import extract_pdf  # noqa: E402
+from job_ads import JOB_ADS  # noqa: E402
+from scanner import highlight_keywords_in_text, normalize_text, scan_cv, scan_text  # noqa: E402
+from synthetic_pdf import make_cv_pdf  # noqa: E402
+
+REPORT_VERSION = 1
+# Regressions smaller than this (seconds) are treated as noise.
+NOISE_FLOOR = 0.0005
+# Matching options for the match_tokens stage; see matcher.TokenMatcher
+TOKEN_MATCHING = {
+    "word_boundary": True,
+    "stemming": True,
+    "max_edits": 2,
+    "synonyms": {"go": ["golang"], "react": ["reactjs", "react.js"]},
+}
+MATCH_BUDGET = 3.0
+
+
+def build_keywords(total, base=None):
+    """A tiered keyword set of `total` keywords, starting from a real job's."""
+    base = base or JOB_ADS["fullstack"]["keywords"]
+    must = list(base["must_have"])
+    nice = list(base["nice_to_have"])
+    i = 0
+    while len(must) + len(nice) < total:
+        (must if i % 3 == 0 else nice).append(f"skill{i:04d}")
+        i += 1
+    return {"must_have": must, "nice_to_have": nice}
+
+
+def time_stage(fn, repeat, setup=None):
+    """Timing stats over `repeat` runs of fn; setup runs untimed before each."""
+    timings = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    timings.sort()
+    return {
+        "min": timings[0],
+        "median": statistics.median(timings),
+        "mean": statistics.fmean(timings),
+        "p95": timings[min(len(timings) - 1, int(len(timings) * 0.95))],
+        "runs": repeat,
+    }
+
+
+def peak_memory(fn, setup=None):
+    if setup:
+        setup()
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def run_scenario(name, pages, keyword_count, density, repeat, workdir):
+    keywords = build_keywords(keyword_count)
+    all_keywords = keywords["must_have"] + keywords["nice_to_have"]
+    path = os.path.join(workdir, f"{name}.pdf")
+    make_cv_pdf(path, pages=pages, keywords=all_keywords, density=density)
+
+    text = extract_pdf(path, max_pages=pages)["text"]
+    normalized = normalize_text(text)
+    compiled = matcher.get_matcher(keywords)
+    token_matcher = matcher.get_matcher(dict(keywords, matching=TOKEN_MATCHING))
+    result = scan_text(text, keywords)
+    matched = result["matched_keywords"]["must_have"] + result["matched_keywords"]["nice_to_have"]
+
+    def cold_token_matcher():
+        # Memos filled by earlier runs would turn later runs into lookups
+        token_matcher._near_terms.clear()
+        matcher.stem.cache_clear()
+
+    def compile_matcher():
+        matcher._compile.cache_clear()
+        matcher.get_matcher(keywords)
+
+    stages = {
+        "extract": lambda: extract_pdf(path, max_pages=pages),
+        "normalize": lambda: normalize_text(text),
+        "compile": compile_matcher,
+        "match": lambda: compiled.match(normalized),
+        "match_tokens": lambda: token_matcher.match(normalized),
+        "score": lambda: scan_text(text, keywords),
+        "highlight": lambda: highlight_keywords_in_text(text, matched),
+        "scan_cv": lambda: scan_cv(path, keywords),
+    }
+    setups = {"match_tokens": cold_token_matcher}
+    # Extraction dominates; fewer runs keep large scenarios tolerable
+    slow = {"extract", "scan_cv"}
+
+    report = {
+        "pages": pages,
+        "keywords": keyword_count,
+        "density": density,
+        "cv_chars": len(text),
+        "matched": len(matched),
+        "stages": {},
+    }
+    for stage, fn in stages.items():
+        setup = setups.get(stage)
+        stats = time_stage(fn, max(1, repeat // 5) if stage in slow else repeat, setup)
+        stats["peak_bytes"] = peak_memory(fn, setup)
+        report["stages"][stage] = stats
+    return report
+
+
+def compare(report, baseline, tolerance):
+    """Return a list of (scenario, stage, baseline_median, median) regressions."""
+    regressions = []
+    for scenario, data in report["scenarios"].items():
+        base = baseline.get("scenarios", {}).get(scenario)
+        if not base:
+            continue
+        for stage, stats in data["stages"].items():
+            base_stats = base["stages"].get(stage)
+            if not base_stats:
+                continue
+            before, after = base_stats["median"], stats["median"]
+            if after > before * (1 + tolerance) and after - before > NOISE_FLOOR:
+                regressions.append((scenario, stage, before, after))
+    return regressions
+
+
+def over_budget(report, budget):
+    """Return (scenario, match_p95, match_tokens_p95) where token matching is too slow."""
+    slow = []
+    for scenario, data in report["scenarios"].items():
+        plain, tokens = data["stages"]["match"]["p95"], data["stages"]["match_tokens"]["p95"]
+        if tokens > plain * budget + NOISE_FLOOR:
+            slow.append((scenario, plain, tokens))
+    return slow
+
+
+def print_report(report):
+    for scenario, data in report["scenarios"].items():
+        print(f"{scenario}: {data['pages']} pages, {data['cv_chars']:,} chars, "
+              f"{data['keywords']} keywords ({data['matched']} matched)")
+        for stage, stats in data["stages"].items():
+            print(f"  {stage:<12} median {stats['median'] * 1000:9.3f} ms   "
+                  f"p95 {stats['p95'] * 1000:9.3f} ms   peak {stats['peak_bytes'] / 1024:9.1f} KiB")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the scan pipeline stage by stage.")
+    parser.add_argument("--pages", default="1,4,20", help="comma-separated page counts, one scenario each")
+    parser.add_argument("--keywords", type=int, default=100, help="keywords per job")
+    parser.add_argument("--density", type=float, default=0.03, help="fraction of CV words that are keywords")
+    parser.add_argument("--repeat", type=int, default=20, help="timed runs per fast stage")
+    parser.add_argument("--output", help="write the JSON report here")
+    parser.add_argument("--baseline", help="compare against a saved JSON report")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="allowed slowdown vs baseline medians (0.25 = 25%%)")
+    parser.add_argument("--match-budget", type=float, default=MATCH_BUDGET,
+                        help="allowed p95 of token matching, as a multiple of substring matching")
+    args = parser.parse_args(argv)
+
+    extract_cache.MAX_BYTES = 0
+    report = {
+        "version": REPORT_VERSION,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "scenarios": {},
+    }
+    with tempfile.TemporaryDirectory() as workdir:
+        for pages in (int(p) for p in args.pages.split(",")):
+            name = f"{pages}p-{args.keywords}kw"
+            report["scenarios"][name] = run_scenario(
+                name, pages, args.keywords, args.density, args.repeat, workdir
+            )
+
+    print_report(report)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    slow = over_budget(report, args.match_budget)
+    for scenario, plain, tokens in slow:
+        print(f"OVER BUDGET {scenario} match_tokens: p95 {tokens * 1000:.3f} ms vs "
+              f"{plain * 1000:.3f} ms for substring matching")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.tolerance)
+        for scenario, stage, before, after in regressions:
+            print(f"REGRESSION {scenario} {stage}: {before * 1000:.3f} ms -> {after * 1000:.3f} ms")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions beyond {args.tolerance:.0%} of baseline.")
+    if slow:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""Import time and memory of the app, the CLI tools and their building blocks.
+
+    python benchmarks/startup.py                 # print a report
+    python benchmarks/startup.py --repeat 10 --check
+
+Each module is imported in a fresh interpreter, --repeat times; the report
+gives the median import time, the peak RSS over a bare interpreter, and
+which heavy libraries (the PDF backend, numpy) the import loaded. The PDF
+backend is only imported when a CV is first extracted, and numpy only by
+batch_scoring (the app imports it on the first ranking request), so each
+row should load only what it is expected to. --check exits 1 if one loads
+more.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from synthetic_pdf import make_cv_pdf  # noqa: E402
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PDF_MODULES = ("pdfplumber", "pdfminer", "pypdfium2")
+HEAVY_MODULES = PDF_MODULES + ("numpy",)
+# (label, statements timed in the child, heavy libraries it may load)
+TARGETS = (
+    ("pdfplumber", "import pdfplumber", PDF_MODULES),
+    ("first extract", "import scanner; scanner.extract_text_from_pdf(PDF)", PDF_MODULES),
+    ("matcher", "import matcher", ()),
+    ("scanner", "import scanner", ()),
+    ("rescore", "import rescore", ()),
+    ("score_matrix", "import score_matrix", ()),
+    ("batch_scoring", "import batch_scoring", ("numpy",)),
+    ("scan_queue", "import scan_queue", ()),
+    ("app", "import app", ()),
+    ("app dashboard", "import app; client = app.app.test_client(); "
+     "client.post('/admin', data=dict(password=app.ADMIN_PASSWORD)); client.get('/admin/dashboard')", ()),
+    ("app ranking", "import app; client = app.app.test_client(); "
+     "client.post('/admin', data=dict(password=app.ADMIN_PASSWORD)); client.get('/admin/ranking')",
+     ("numpy",)),
+)
+
+CHILD = """
+import json, resource, sys, time
+PDF = {pdf!r}
+started = time.perf_counter()
+{statements}
+elapsed = time.perf_counter() - started
+loaded = sorted({{name.split(".")[0] for name in sys.modules}} & set({heavy_modules!r}))
+print(json.dumps({{"seconds": elapsed, "rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+                  "heavy_modules": loaded}}))
+"""
+
+
+def measure(statements, pdf, env):
+    code = CHILD.format(pdf=pdf, statements=statements, heavy_modules=HEAVY_MODULES)
+    output = subprocess.run(
+        [sys.executable, "-c", code], cwd=ROOT, env=env, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+def run(repeat, workdir):
+    pdf = os.path.join(workdir, "cv.pdf")
+    make_cv_pdf(pdf, pages=2, keywords=["python", "docker"])
+    env = dict(
+        os.environ,
+        PYTHONPATH=ROOT,
+        ATS_DATABASE=os.path.join(workdir, "ats.db"),
+        ATS_EXTRACT_CACHE=os.path.join(workdir, "extract_cache.db"),
+    )
+    baseline_kb = statistics.median(measure("pass", pdf, env)["rss_kb"] for _ in range(repeat))
+    results = {}
+    for label, statements, allowed in TARGETS:
+        runs = [measure(statements, pdf, env) for _ in range(repeat)]
+        loaded = runs[-1]["heavy_modules"]
+        results[label] = {
+            "seconds": statistics.median(r["seconds"] for r in runs),
+            "rss_mb": (statistics.median(r["rss_kb"] for r in runs) - baseline_kb) / 1024,
+            "heavy_modules": loaded,
+            "unexpected": [name for name in loaded if name not in allowed],
+        }
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure import time and RSS of each entry point.")
+    parser.add_argument("--repeat", type=int, default=5, help="fresh interpreters per module")
+    parser.add_argument("--check", action="store_true",
+                        help="exit 1 if a module loads a heavy library it should not")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        results = run(args.repeat, workdir)
+
+    print(f"{'module':<16} {'import ms':>10} {'+RSS MiB':>9}  heavy libraries")
+    for label, result in results.items():
+        print(f"{label:<16} {result['seconds'] * 1000:10.1f} {result['rss_mb']:9.1f}  "
+              f"{', '.join(result['heavy_modules']) or '-'}")
+
+    eager = [label for label, result in results.items() if result["unexpected"]]
+    for label in eager:
+        print(f"EAGER {label} imports {', '.join(results[label]['unexpected'])}")
+    if args.check and eager:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
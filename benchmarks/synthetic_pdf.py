@@ -0,0 +1,105 @@
+"""Synthetic CV PDFs for benchmarks, written with the standard library only.
+
+    python benchmarks/synthetic_pdf.py out.pdf --pages 5 --density 0.05
+
+The generated files use the built-in Helvetica font and plain text-showing
+operators, which pdfplumber extracts like a real single-column CV.
+"""
+
+import argparse
+import random
+
+FILLER = (
+    "experience team project delivered worked built designed led managed "
+    "improved customers product company role responsible developed services "
+    "platform using across multiple stakeholders results quality process data "
+    "performance systems users business growth support maintained created"
+).split()
+
+LINE_WORDS = 12
+LINES_PER_PAGE = 48
+
+
+def _escape(text):
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def cv_lines(pages, keywords, density, seed=0, lines_per_page=LINES_PER_PAGE):
+    """Return one list of text lines per page.
+
+    density is the fraction of words drawn from keywords instead of filler.
+    """
+    rng = random.Random(seed)
+    result = []
+    for page in range(pages):
+        lines = [f"Curriculum Vitae - page {page + 1}"]
+        for _ in range(lines_per_page - 1):
+            words = [
+                rng.choice(keywords) if keywords and rng.random() < density else rng.choice(FILLER)
+                for _ in range(LINE_WORDS)
+            ]
+            lines.append(" ".join(words))
+        result.append(lines)
+    return result
+
+
+def build_pdf(pages_lines):
+    """Serialize pages of text lines into PDF bytes."""
+    objects = []
+
+    def add(body):
+        objects.append(body)
+        return len(objects)
+
+    font = add(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    pages_id = len(objects) + 2 * len(pages_lines) + 1
+    kids = []
+    for lines in pages_lines:
+        ops = " ".join(f"({_escape(line)}) '" for line in lines)
+        stream = f"BT /F1 10 Tf 40 780 Td 15 TL {ops} ET".encode("latin-1", "replace")
+        content = add(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        kids.append(add(
+            b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 612 792] "
+            b"/Resources << /Font << /F1 %d 0 R >> >> /Contents %d 0 R >>"
+            % (pages_id, font, content)
+        ))
+    add(b"<< /Type /Pages /Kids [%s] /Count %d >>"
+        % (b" ".join(b"%d 0 R" % kid for kid in kids), len(kids)))
+    catalog = add(b"<< /Type /Catalog /Pages %d 0 R >>" % pages_id)
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (
+        len(objects) + 1, catalog, xref)
+    return bytes(out)
+
+
+def make_cv_pdf(path, pages=2, keywords=(), density=0.05, seed=0, lines_per_page=LINES_PER_PAGE):
+    """Write a synthetic CV to path and return its text lines."""
+    pages_lines = cv_lines(pages, list(keywords), density, seed, lines_per_page)
+    with open(path, "wb") as f:
+        f.write(build_pdf(pages_lines))
+    return pages_lines
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write a synthetic CV PDF.")
+    parser.add_argument("path")
+    parser.add_argument("--pages", type=int, default=2)
+    parser.add_argument("--lines", type=int, default=LINES_PER_PAGE, help="lines per page")
+    parser.add_argument("--keywords", default="react,python,go,typescript,gcp",
+                        help="comma-separated keywords to sprinkle in")
+    parser.add_argument("--density", type=float, default=0.05)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    make_cv_pdf(args.path, args.pages, args.keywords.split(","), args.density, args.seed, args.lines)
+
+
+if __name__ == "__main__":
+    main()
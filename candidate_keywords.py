@@ -0,0 +1,153 @@
+"""Per-candidate keyword results, stored as rows instead of JSON blobs.
+
+Each distinct keyword string is stored once in `keywords`. candidate_keywords
+records, for every candidate, each job keyword it was scored against: its
+tier, whether it matched, and its position in the job's list. "Who has
+keyword X" is an index lookup (see MATCHED_SQL). Suggestions are not stored;
+they are rebuilt from the missing keywords when a result is shown.
+"""
+
+import json
+import re
+import sqlite3
+
+TIERS = ("must_have", "nice_to_have")
+# Columns that held JSON before this table existed
+LEGACY_COLUMNS = ("matched_keywords", "missing_keywords", "suggestions")
+# ALTER TABLE ... DROP COLUMN needs SQLite 3.35
+DROP_COLUMN = sqlite3.sqlite_version_info >= (3, 35, 0)
+
+# Candidate ids that matched a keyword, for use as "id IN (...)"
+MATCHED_SQL = """SELECT candidate_id FROM candidate_keywords
+    WHERE matched = 1 AND keyword_id = (SELECT id FROM keywords WHERE keyword = ?)"""
+
+
+def parse_legacy(json_str):
+    """Parse a stored flat list (old) or tiered dict (new) into tier lists."""
+    data = json.loads(json_str) if json_str else []
+    if isinstance(data, list):
+        return {"must_have": data, "nice_to_have": []}
+    return {tier: data.get(tier, []) for tier in TIERS}
+
+
+def keyword_ids(conn, keywords):
+    """{keyword: id}, adding keywords seen for the first time (no commit)."""
+    unique = list(dict.fromkeys(keywords))
+    conn.executemany("INSERT OR IGNORE INTO keywords (keyword) VALUES (?)", [(kw,) for kw in unique])
+    ids = {}
+    for start in range(0, len(unique), 500):
+        chunk = unique[start:start + 500]
+        ids.update(conn.execute(
+            f"SELECT keyword, id FROM keywords WHERE keyword IN ({','.join('?' * len(chunk))})", chunk
+        ))
+    return ids
+
+
+def store_many(conn, results):
+    """Replace keyword rows for (candidate_id, matched, missing) triples (no commit).
+
+    matched and missing are {"must_have": [...], "nice_to_have": [...]}.
+    """
+    results = list(results)
+    ids = keyword_ids(conn, [
+        kw for _, matched, missing in results for tiers in (matched, missing)
+        for tier in TIERS for kw in tiers.get(tier, [])
+    ])
+    rows = []
+    for candidate_id, matched, missing in results:
+        for flag, tiers in ((1, matched), (0, missing)):
+            for tier_index, tier in enumerate(TIERS):
+                for position, kw in enumerate(tiers.get(tier, [])):
+                    rows.append((candidate_id, tier_index, flag, position, ids[kw]))
+    conn.executemany(
+        "DELETE FROM candidate_keywords WHERE candidate_id = ?",
+        [(candidate_id,) for candidate_id, _, _ in results],
+    )
+    conn.executemany(
+        """INSERT INTO candidate_keywords (candidate_id, tier, matched, position, keyword_id)
+           VALUES (?, ?, ?, ?, ?)""",
+        rows,
+    )
+
+
+def store(conn, candidate_id, matched, missing):
+    store_many(conn, [(candidate_id, matched, missing)])
+
+
+def load(conn, candidate_id):
+    """Return (matched, missing) tier dicts, in the job's keyword order."""
+    matched = {tier: [] for tier in TIERS}
+    missing = {tier: [] for tier in TIERS}
+    rows = conn.execute(
+        """SELECT ck.tier, ck.matched, k.keyword FROM candidate_keywords ck
+           JOIN keywords k ON k.id = ck.keyword_id
+           WHERE ck.candidate_id = ? ORDER BY ck.tier, ck.matched, ck.position""",
+        (candidate_id,),
+    )
+    for tier, is_matched, keyword in rows:
+        (matched if is_matched else missing)[TIERS[tier]].append(keyword)
+    return matched, missing
+
+
+def needs_migration(conn):
+    """True while candidates still has legacy JSON columns holding results.
+
+    Where they could not be dropped, migrating relaxed their NOT NULL, which
+    marks them as done.
+    """
+    return any(
+        row["name"] in LEGACY_COLUMNS and row["notnull"]
+        for row in conn.execute("PRAGMA table_info(candidates)")
+    )
+
+
+def _drop_not_null(conn, table, columns):
+    """Make NOT NULL columns nullable in place (no commit).
+
+    SQLite's documented procedure for removing a NOT NULL constraint without
+    rebuilding the table: rewrite the stored CREATE TABLE statement and bump
+    the schema version.
+    """
+    sql = conn.execute(
+        "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)
+    ).fetchone()[0]
+    for column in columns:
+        sql = re.sub(rf"\b({column}\s+TEXT)\s+NOT\s+NULL", r"\1", sql, flags=re.IGNORECASE)
+    version = conn.execute("PRAGMA schema_version").fetchone()[0]
+    conn.execute("PRAGMA writable_schema = ON")
+    conn.execute("UPDATE sqlite_master SET sql = ? WHERE type = 'table' AND name = ?", (sql, table))
+    conn.execute(f"PRAGMA schema_version = {version + 1}")
+    conn.execute("PRAGMA writable_schema = OFF")
+
+
+def migrate_json_columns(conn, batch_size=500):
+    """Move legacy JSON keyword columns into candidate_keywords and drop them.
+
+    Runs in one transaction, then vacuums so the space is returned. SQLite
+    before 3.35 cannot drop columns; there they are left in place, emptied
+    and made nullable so new rows need not fill them.
+    """
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            """SELECT id, matched_keywords, missing_keywords FROM candidates
+               WHERE id > ? ORDER BY id LIMIT ?""",
+            (last_id, batch_size),
+        ).fetchall()
+        if not rows:
+            break
+        store_many(conn, [
+            (row["id"], parse_legacy(row["matched_keywords"]), parse_legacy(row["missing_keywords"]))
+            for row in rows
+        ])
+        last_id = rows[-1]["id"]
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(candidates)")
+               if row[1] in LEGACY_COLUMNS]
+    if DROP_COLUMN:
+        for column in columns:
+            conn.execute(f"ALTER TABLE candidates DROP COLUMN {column}")
+    else:
+        _drop_not_null(conn, "candidates", columns)
+        conn.execute(f"UPDATE candidates SET {', '.join(f'{c} = NULL' for c in columns)}")
+    conn.commit()
+    conn.execute("VACUUM")
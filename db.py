@@ -0,0 +1,149 @@
+import os
+import queue
+import sqlite3
+import threading
+
+import analytics
+import candidate_keywords
+
+DATABASE = os.environ.get("ATS_DATABASE", os.path.join(os.path.dirname(__file__), "ats.db"))
+SCHEMA_PATH = os.path.join(os.path.dirname(__file__), "schema.sql")
+
+# Applied to every connection. WAL lets dashboard reads proceed while a scan
+# is being written; busy_timeout makes writers wait instead of failing with
+# "database is locked".
+PRAGMAS = (
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA busy_timeout = 5000",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA cache_size = -16000",
+    "PRAGMA foreign_keys = ON",
+)
+
+# Compiled statements kept per connection; pooled connections reuse them.
+STATEMENT_CACHE_SIZE = 256
+POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", "8"))
+
+# Columns added after the first release. Older databases get them via
+# migrate() before schema.sql runs, so indexes in schema.sql can rely on them.
+COLUMN_MIGRATIONS = [
+    ("candidates", "status", "TEXT NOT NULL DEFAULT 'done'"),
+    ("candidates", "error", "TEXT"),
+    ("candidates", "source_path", "TEXT"),
+    ("candidates", "keywords_fingerprint", "TEXT"),
+    ("candidates", "extraction_partial", "TEXT"),
+]
+
+
+def connect(path=None):
+    conn = sqlite3.connect(
+        path or DATABASE,
+        timeout=5,
+        cached_statements=STATEMENT_CACHE_SIZE,
+        check_same_thread=False,
+    )
+    conn.row_factory = sqlite3.Row
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+
+class ConnectionPool:
+    """A small pool of open connections to one database file.
+
+    Each connection is used by one thread at a time, so its prepared
+    statements and page cache survive from request to request. A pool
+    inherited across fork() starts empty in the child.
+    """
+
+    def __init__(self, path, size=POOL_SIZE):
+        self.path = path
+        self.size = size
+        self._pid = os.getpid()
+        self._idle = queue.LifoQueue()
+
+    def acquire(self):
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._idle = queue.LifoQueue()
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            return connect(self.path)
+
+    def release(self, conn):
+        if conn.in_transaction:
+            conn.rollback()
+        if self._pid == os.getpid() and self._idle.qsize() < self.size:
+            self._idle.put(conn)
+        else:
+            conn.close()
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(path=None):
+    path = path or DATABASE
+    with _pools_lock:
+        pool = _pools.get(path)
+        if pool is None:
+            pool = _pools[path] = ConnectionPool(path)
+        return pool
+
+
+def table_columns(conn, table):
+    return {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+
+
+def migrate(conn):
+    """Add any missing columns to tables created by an older schema.sql."""
+    for table, column, definition in COLUMN_MIGRATIONS:
+        columns = table_columns(conn, table)
+        if columns and column not in columns:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+    conn.commit()
+
+
+def table_exists(conn, name):
+    row = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (name,)
+    ).fetchone()
+    return row is not None
+
+
+def init_db(path=None):
+    with open(SCHEMA_PATH) as f:
+        schema = f.read()
+    conn = connect(path)
+    migrate(conn)
+    had_fts = table_exists(conn, "candidates_fts")
+    had_uploads = table_exists(conn, "uploads")
+    had_stats = table_exists(conn, "job_stats")
+    conn.executescript(schema)
+    if not had_fts:
+        # Index rows that existed before the full-text table did
+        conn.execute("INSERT INTO candidates_fts (candidates_fts) VALUES ('rebuild')")
+        conn.commit()
+    if candidate_keywords.needs_migration(conn):
+        # Keyword results used to be JSON columns on candidates
+        candidate_keywords.migrate_json_columns(conn)
+    if not had_uploads:
+        # Reference-count files saved before uploads were content-addressed
+        conn.execute(
+            """INSERT INTO uploads (filename, refcount)
+               SELECT pdf_filename, COUNT(*) FROM candidates GROUP BY pdf_filename"""
+        )
+        conn.commit()
+    if not had_stats:
+        # Roll up candidates scored before the analytics triggers existed
+        analytics.rebuild(conn)
+    conn.close()
@@ -0,0 +1,151 @@
+"""Stream candidates out as CSV or NDJSON.
+
+    python export.py > candidates.csv
+    python export.py --format ndjson --job fullstack --min-score 50 --cv-text -o top.ndjson
+
+Rows are read with fetchmany() from a single SELECT and written out batch by
+batch, so memory use does not grow with the number of candidates. The same
+generators back the admin's /admin/export download.
+"""
+
+import argparse
+import csv
+import io
+import json
+import sys
+
+import db
+
+FORMATS = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+}
+COLUMNS = (
+    "id", "name", "job_id", "score", "status", "error", "created_at",
+    "extraction_partial", "matched_keywords", "missing_keywords",
+)
+FETCH_SIZE = 500
+# Spreadsheets run cells starting with these as formulas; names are user input
+FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+# Keywords in the job's order, as a JSON array
+_KEYWORDS_SQL = """(SELECT json_group_array(keyword) FROM (
+    SELECT k.keyword FROM candidate_keywords ck JOIN keywords k ON k.id = ck.keyword_id
+    WHERE ck.candidate_id = c.id AND ck.matched = {matched} ORDER BY ck.tier, ck.position))"""
+
+
+def columns(include_cv_text=False):
+    return COLUMNS + ("cv_text",) if include_cv_text else COLUMNS
+
+
+def iter_candidates(conn, job_id=None, min_score=None, max_score=None, include_cv_text=False):
+    """Yield candidate dicts in id order, optionally filtered by job and score."""
+    where = []
+    params = []
+    if job_id:
+        where.append("c.job_id = ?")
+        params.append(job_id)
+    if min_score is not None:
+        where.append("c.score >= ?")
+        params.append(min_score)
+    if max_score is not None:
+        where.append("c.score <= ?")
+        params.append(max_score)
+    selected = [
+        f"c.{column}" for column in columns(include_cv_text)
+        if column not in ("matched_keywords", "missing_keywords")
+    ]
+    sql = (
+        f"SELECT {', '.join(selected)}, {_KEYWORDS_SQL.format(matched=1)} AS matched_keywords, "
+        f"{_KEYWORDS_SQL.format(matched=0)} AS missing_keywords FROM candidates c"
+    )
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += " ORDER BY c.id"
+
+    cursor = conn.execute(sql, params)
+    while True:
+        rows = cursor.fetchmany(FETCH_SIZE)
+        if not rows:
+            return
+        for row in rows:
+            candidate = dict(row)
+            for column in ("matched_keywords", "missing_keywords"):
+                candidate[column] = json.loads(candidate[column])
+            yield candidate
+
+
+def _csv_cell(value):
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def iter_csv(candidates, include_cv_text=False):
+    """Yield CSV text in chunks of up to FETCH_SIZE rows; keywords are "; "-joined.
+
+    Text that a spreadsheet would treat as a formula gets a leading "'".
+    """
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=columns(include_cv_text), extrasaction="ignore")
+    writer.writeheader()
+    count = 0
+    for candidate in candidates:
+        for column in ("matched_keywords", "missing_keywords"):
+            candidate[column] = "; ".join(candidate[column])
+        writer.writerow({column: _csv_cell(value) for column, value in candidate.items()})
+        count += 1
+        if count % FETCH_SIZE == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def iter_ndjson(candidates):
+    """Yield one JSON object per line, in chunks of up to FETCH_SIZE rows."""
+    lines = []
+    for candidate in candidates:
+        lines.append(json.dumps(candidate, ensure_ascii=False) + "\n")
+        if len(lines) == FETCH_SIZE:
+            yield "".join(lines)
+            lines = []
+    if lines:
+        yield "".join(lines)
+
+
+def export(conn, fmt="csv", job_id=None, min_score=None, max_score=None, include_cv_text=False):
+    """Yield the export as text chunks in the given format ("csv" or "ndjson")."""
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown export format {fmt!r}; use one of {', '.join(FORMATS)}")
+    candidates = iter_candidates(conn, job_id, min_score, max_score, include_cv_text)
+    if fmt == "csv":
+        return iter_csv(candidates, include_cv_text)
+    return iter_ndjson(candidates)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export candidates as CSV or NDJSON.")
+    parser.add_argument("--format", choices=FORMATS, default="csv")
+    parser.add_argument("--job", help="only candidates for this job id")
+    parser.add_argument("--min-score", type=float, help="lowest score to include")
+    parser.add_argument("--max-score", type=float, help="highest score to include")
+    parser.add_argument("--cv-text", action="store_true", help="include the extracted CV text")
+    parser.add_argument("-o", "--output", help="write here instead of stdout")
+    parser.add_argument("--db", default=None, help="SQLite database path")
+    args = parser.parse_args(argv)
+
+    db.init_db(args.db)
+    conn = db.connect(args.db)
+    out = open(args.output, "w", newline="", encoding="utf-8") if args.output else sys.stdout
+    try:
+        for chunk in export(conn, args.format, args.job, args.min_score, args.max_score, args.cv_text):
+            out.write(chunk)
+    finally:
+        if args.output:
+            out.close()
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
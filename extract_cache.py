@@ -0,0 +1,174 @@
+"""Persistent cache of extracted CV text, keyed by the SHA-256 of the PDF.
+
+Entries live in a small SQLite file next to uploads/ and are evicted least
+recently used first once the stored text exceeds EXTRACT_CACHE_MAX_BYTES.
+Hit and miss counters are kept in the same file so every process (web
+workers, scan pool, CLI tools) contributes to one set of numbers. Triggers
+keep a running entry count and byte total there too, so eviction and stats()
+never have to read the cached text.
+"""
+
+import hashlib
+import os
+import time
+
+import db
+
+CACHE_PATH = os.environ.get(
+    "ATS_EXTRACT_CACHE", os.path.join(os.path.dirname(__file__), "extract_cache.db")
+)
+# Upper bound on cached text in bytes; 0 disables the cache.
+MAX_BYTES = int(os.environ.get("EXTRACT_CACHE_MAX_BYTES", str(200 * 1024 * 1024)))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS extracted_text (
+    sha256 TEXT PRIMARY KEY,
+    text TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    pdf_filename TEXT,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_extracted_text_last_used ON extracted_text (last_used);
+CREATE TABLE IF NOT EXISTS counters (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO counters (name, value) VALUES ('hits', 0), ('misses', 0);
+
+BEGIN IMMEDIATE;
+-- Totals for caches created before the triggers existed (counted once)
+INSERT INTO counters (name, value)
+SELECT 'entries', (SELECT COUNT(*) FROM extracted_text)
+WHERE NOT EXISTS (SELECT 1 FROM counters WHERE name = 'entries');
+INSERT INTO counters (name, value)
+SELECT 'bytes', (SELECT COALESCE(SUM(size), 0) FROM extracted_text)
+WHERE NOT EXISTS (SELECT 1 FROM counters WHERE name = 'bytes');
+CREATE TRIGGER IF NOT EXISTS extracted_text_add AFTER INSERT ON extracted_text BEGIN
+    UPDATE counters SET value = value + 1 WHERE name = 'entries';
+    UPDATE counters SET value = value + new.size WHERE name = 'bytes';
+END;
+CREATE TRIGGER IF NOT EXISTS extracted_text_remove AFTER DELETE ON extracted_text BEGIN
+    UPDATE counters SET value = value - 1 WHERE name = 'entries';
+    UPDATE counters SET value = value - old.size WHERE name = 'bytes';
+END;
+COMMIT;
+"""
+
+_initialized = set()
+
+
+def file_digest(path):
+    """SHA-256 hex digest of a file, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _connect(path=None):
+    path = path or CACHE_PATH
+    conn = db.get_pool(path).acquire()
+    if path not in _initialized:
+        conn.executescript(SCHEMA)
+        _initialized.add(path)
+    return conn
+
+
+def _release(conn, path=None):
+    db.get_pool(path or CACHE_PATH).release(conn)
+
+
+def _count(conn, name):
+    conn.execute("UPDATE counters SET value = value + 1 WHERE name = ?", (name,))
+
+
+def get(digest, path=None):
+    """Return cached text for a digest, or None. Counts a hit or a miss."""
+    conn = _connect(path)
+    with conn:
+        row = conn.execute(
+            "SELECT text FROM extracted_text WHERE sha256 = ?", (digest,)
+        ).fetchone()
+        if row is None:
+            _count(conn, "misses")
+        else:
+            _count(conn, "hits")
+            conn.execute(
+                "UPDATE extracted_text SET last_used = ? WHERE sha256 = ?",
+                (time.time(), digest),
+            )
+    _release(conn, path)
+    return row[0] if row else None
+
+
+def put(digest, text, pdf_filename=None, path=None, max_bytes=None):
+    """Store extracted text, then evict the oldest entries beyond max_bytes."""
+    max_bytes = MAX_BYTES if max_bytes is None else max_bytes
+    size = len(text.encode("utf-8"))
+    if size > max_bytes:
+        return
+    conn = _connect(path)
+    with conn:
+        conn.execute(
+            """INSERT INTO extracted_text (sha256, text, size, pdf_filename, last_used)
+               VALUES (?, ?, ?, ?, ?)
+               ON CONFLICT (sha256) DO UPDATE SET last_used = excluded.last_used,
+               pdf_filename = COALESCE(extracted_text.pdf_filename, excluded.pdf_filename)""",
+            (digest, text, size, pdf_filename, time.time()),
+        )
+        _evict(conn, max_bytes)
+    _release(conn, path)
+
+
+def _evict(conn, max_bytes):
+    total = conn.execute("SELECT value FROM counters WHERE name = 'bytes'").fetchone()[0]
+    if total <= max_bytes:
+        return
+    rows = conn.execute("SELECT sha256, size FROM extracted_text ORDER BY last_used")
+    victims = []
+    for sha, size in rows:
+        if total <= max_bytes:
+            break
+        victims.append((sha,))
+        total -= size
+    conn.executemany("DELETE FROM extracted_text WHERE sha256 = ?", victims)
+
+
+def get_or_extract(pdf_path, extract, path=None):
+    """Return extract(pdf_path), or the cached text of an identical PDF.
+
+    extract returns a dict with "text" and "partial"; only complete
+    extractions are cached.
+    """
+    if MAX_BYTES <= 0:
+        return extract(pdf_path)
+    digest = file_digest(pdf_path)
+    text = get(digest, path)
+    if text is not None:
+        return {"text": text, "partial": None}
+    extraction = extract(pdf_path)
+    if not extraction["partial"]:
+        put(digest, extraction["text"], os.path.basename(pdf_path), path)
+    return extraction
+
+
+def stats(path=None):
+    """Hit/miss counters plus current entry count and size."""
+    conn = _connect(path)
+    counters = dict(conn.execute("SELECT name, value FROM counters"))
+    _release(conn, path)
+    lookups = counters["hits"] + counters["misses"]
+    return {
+        "hits": counters["hits"],
+        "misses": counters["misses"],
+        "hit_rate": round(counters["hits"] / lookups, 3) if lookups else 0.0,
+        "entries": counters["entries"],
+        "bytes": counters["bytes"],
+        "max_bytes": MAX_BYTES,
+    }
+
+
+if __name__ == "__main__":
+    for key, value in stats().items():
+        print(f"{key}: {value}")
@@ -0,0 +1,312 @@
+"""Budgeted, page-by-page PDF text extraction.
+
+Pages are read lazily and joined once at the end. Extraction stops early
+when the page, character or wall-clock budget runs out, and the result says
+so instead of failing. On the main thread of a POSIX process (CLI tools, and
+scan and ingest pool workers) the time budget interrupts a page that is
+still being read; elsewhere it is checked between pages.
+
+Long documents are split into page ranges and read by a process pool, but
+only in top-level processes: the CLI tools, and the web process when scans
+run inline (SCAN_WORKERS=0). Scan and ingest pool workers read pages
+serially, as those pools already extract several documents at once and a
+page pool in each would multiply with them.
+
+PDFs are read through a backend, chosen by EXTRACT_BACKEND: a name from
+BACKENDS or a "module:attribute" path. A backend is a callable that takes a
+PDF path and returns a document, used as a context manager, with a
+page_count attribute and iter_pages(start, stop, mode) yielding page texts.
+Backends are imported on first use, so importing this module (and scanner,
+app, the CLI tools) does not load pdfplumber and pdfminer.
+"""
+
+import importlib
+import multiprocessing
+import os
+import signal
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager, nullcontext
+from functools import lru_cache
+
+BACKENDS = {
+    "pdfplumber": "extraction:PdfplumberDocument",
+    "pdfium": "extraction:PdfiumDocument",
+}
+BACKEND = os.environ.get("EXTRACT_BACKEND", "pdfplumber")
+
+MODE_LAYOUT = "layout"
+MODE_TEXT = "text"
+
+MAX_PAGES = int(os.environ.get("EXTRACT_MAX_PAGES", "30"))
+MAX_CHARS = int(os.environ.get("EXTRACT_MAX_CHARS", "200000"))
+TIMEOUT = float(os.environ.get("EXTRACT_TIMEOUT", "20"))
+# "layout" keeps pdfplumber's line clustering; "text" reads pdfium's native
+# text instead, an order of magnitude faster and enough for keyword matching.
+MODE = os.environ.get("EXTRACT_MODE", MODE_LAYOUT)
+
+# Documents with at least this many pages are split across EXTRACT_WORKERS
+# processes, PARALLEL_CHUNK_PAGES pages per task.
+PARALLEL_MIN_PAGES = int(os.environ.get("EXTRACT_PARALLEL_MIN_PAGES", "8"))
+PARALLEL_CHUNK_PAGES = 4
+EXTRACT_WORKERS = int(os.environ.get("EXTRACT_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+_executor = None
+
+
+class PdfplumberDocument:
+    """The default backend: pdfplumber, imported when the first PDF is opened.
+
+    Text mode is delegated to PdfiumDocument.
+    """
+
+    def __init__(self, pdf_path):
+        import pdfplumber
+
+        self.path = pdf_path
+        self._pdf = pdfplumber.open(pdf_path)
+        try:
+            self.page_count = len(self._pdf.pages)
+        except Exception:
+            self._pdf.close()
+            raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self._pdf.close()
+
+    def iter_pages(self, start=0, stop=None, mode=MODE_LAYOUT):
+        """Yield the text of each page in [start, stop), releasing pages as it goes."""
+        if mode == MODE_TEXT:
+            with PdfiumDocument(self.path) as document:
+                yield from document.iter_pages(start, stop, mode)
+            return
+        for page in self._pdf.pages[start:stop]:
+            text = page.extract_text()
+            page.close()
+            yield text or ""
+
+
+class PdfiumDocument:
+    """Plain text from pdfium (pypdfium2, installed with pdfplumber); no layout mode."""
+
+    def __init__(self, pdf_path):
+        import pypdfium2
+
+        self._pdf = pypdfium2.PdfDocument(pdf_path)
+        self.page_count = len(self._pdf)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self._pdf.close()
+
+    def iter_pages(self, start=0, stop=None, mode=MODE_TEXT):
+        for index in range(*slice(start, stop).indices(self.page_count)):
+            page = self._pdf[index]
+            textpage = page.get_textpage()
+            text = textpage.get_text_bounded()
+            textpage.close()
+            page.close()
+            yield text.replace("\r\n", "\n")
+
+
+@lru_cache(maxsize=None)
+def get_backend(name=None):
+    """The document class (or factory) for a backend name or "module:attribute" path."""
+    name = name or BACKEND
+    target = BACKENDS.get(name, name)
+    module_name, sep, attribute = target.partition(":")
+    if not sep:
+        raise ValueError(
+            f"Unknown extraction backend {name!r}; use one of {', '.join(BACKENDS)} or module:attribute"
+        )
+    return getattr(importlib.import_module(module_name), attribute)
+
+
+def open_document(pdf_path, backend=None):
+    return get_backend(backend)(pdf_path)
+
+
+def iter_page_text(pdf_path, start=0, stop=None, mode=MODE_LAYOUT, backend=None):
+    """Yield the text of each page in [start, stop), releasing pages as it goes."""
+    with open_document(pdf_path, backend) as document:
+        yield from document.iter_pages(start, stop, mode)
+
+
+def _extract_range(pdf_path, start, stop, mode, max_chars, deadline, backend):
+    """Pool task: text of pages [start, stop), stopping once max_chars is reached.
+
+    Also stops at the deadline (time.monotonic() is system-wide, so the
+    parent's deadline holds here), so abandoned tasks free the pool quickly.
+    """
+    texts = []
+    chars = 0
+    try:
+        with _time_limit(deadline):
+            for text in iter_page_text(pdf_path, start, stop, mode, backend):
+                texts.append(text)
+                chars += len(text)
+                if chars >= max_chars:
+                    break
+    except TimeoutError:
+        pass
+    return texts
+
+
+@contextmanager
+def _time_limit(deadline):
+    """Raise TimeoutError once the deadline passes, even in the middle of a page.
+
+    Uses SIGALRM, so it only arms on the main thread where setitimer exists;
+    otherwise callers fall back to checking the deadline between pages.
+    """
+    if not hasattr(signal, "setitimer") or threading.current_thread() is not threading.main_thread():
+        yield
+        return
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        raise TimeoutError
+
+    def expired(signum, frame):
+        raise TimeoutError
+
+    previous = signal.signal(signal.SIGALRM, expired)
+    signal.setitimer(signal.ITIMER_REAL, remaining)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(
+            max_workers=EXTRACT_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _executor
+
+
+def _recycle_executor():
+    """Drop the pool, cancelling queued tasks; the next document starts a fresh one."""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def _can_parallelize(page_count, mode):
+    # Only top-level processes get a pool (see the module docstring); text
+    # mode is faster than starting one.
+    return (
+        EXTRACT_WORKERS > 1
+        and page_count >= PARALLEL_MIN_PAGES
+        and mode != MODE_TEXT
+        and multiprocessing.parent_process() is None
+    )
+
+
+def _iter_parallel(pdf_path, page_count, mode, max_chars, deadline, backend):
+    """Yield page texts in order from page ranges read concurrently.
+
+    Raises TimeoutError if the deadline passes before the next range is ready.
+    Ranges abandoned at the deadline stop within their own time limit, and the
+    pool is replaced so later documents do not queue behind them.
+    """
+    global _executor
+    executor = _get_executor()
+    futures = [
+        executor.submit(_extract_range, pdf_path, start,
+                        min(start + PARALLEL_CHUNK_PAGES, page_count), mode, max_chars, deadline,
+                        backend)
+        for start in range(0, page_count, PARALLEL_CHUNK_PAGES)
+    ]
+    try:
+        for future in futures:
+            while not future.done():
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError
+                wait([future], timeout=remaining, return_when=FIRST_COMPLETED)
+            yield from future.result()
+    except BrokenProcessPool:
+        # Let the next document start a fresh pool
+        _executor = None
+        raise
+    finally:
+        abandoned = [future for future in futures if not future.cancel() and not future.done()]
+        if abandoned and time.monotonic() >= deadline:
+            _recycle_executor()
+
+
+def extract_pdf(pdf_path, max_pages=None, max_chars=None, timeout=None, mode=None, backend=None):
+    """Extract text within page, character and time budgets.
+
+    Returns {"text", "pages_read", "page_count", "partial"}, where partial is
+    None for a complete extraction or a short reason when a budget cut it off.
+    """
+    max_pages = MAX_PAGES if max_pages is None else max_pages
+    max_chars = MAX_CHARS if max_chars is None else max_chars
+    timeout = TIMEOUT if timeout is None else timeout
+    mode = mode or MODE
+    # Pool workers are spawned and resolve the backend by name themselves
+    backend = backend or BACKEND
+    deadline = time.monotonic() + timeout
+
+    with open_document(pdf_path, backend) as document:
+        page_count = document.page_count
+        pages_to_read = min(page_count, max_pages)
+        if _can_parallelize(pages_to_read, mode):
+            pages = _iter_parallel(pdf_path, pages_to_read, mode, max_chars, deadline, backend)
+            # Waiting on the ranges is already bounded by the deadline
+            time_limit = nullcontext()
+        else:
+            pages = document.iter_pages(0, pages_to_read, mode)
+            time_limit = _time_limit(deadline)
+
+        chunks = []
+        chars = 0
+        pages_read = 0
+        partial = None
+        try:
+            with time_limit:
+                for text in pages:
+                    pages_read += 1
+                    if text:
+                        chunks.append(text)
+                        chars += len(text) + 1
+                    if chars > max_chars:
+                        partial = f"character limit ({max_chars:,} characters)"
+                        break
+                    if pages_read < pages_to_read and time.monotonic() > deadline:
+                        partial = f"time limit ({timeout:g}s)"
+                        break
+        except TimeoutError:
+            partial = f"time limit ({timeout:g}s)"
+        finally:
+            pages.close()
+
+    if partial is None and page_count > max_pages:
+        partial = f"page limit (first {max_pages} of {page_count} pages)"
+
+    text = "\n".join(chunks)[:max_chars].strip()
+    return {
+        "text": text,
+        "pages_read": pages_read,
+        "page_count": page_count,
+        "partial": partial,
+    }
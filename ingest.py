@@ -0,0 +1,195 @@
+"""Bulk-import a folder of CV PDFs for one job.
+
+    python ingest.py ~/Downloads/cvs --job fullstack
+    python ingest.py "exports/*.pdf" --job project_manager --workers 8
+
+Files are scanned in a process pool and written to the candidates table in
+batched transactions. Re-running the same command skips files that were
+already ingested for that job, so an interrupted import can simply be resumed.
+"""
+
+import argparse
+import glob
+import multiprocessing
+import os
+import sys
+import time
+
+import candidate_keywords
+import db
+import extraction
+import score_matrix
+import upload_store
+from job_ads import get_job_ad, get_job_ads
+from scanner import scan_cv
+
+UPLOAD_FOLDER = os.environ.get("ATS_UPLOAD_FOLDER", os.path.join(os.path.dirname(__file__), "uploads"))
+
+
+def find_pdfs(sources):
+    """Expand directories and glob patterns into a sorted list of PDF paths."""
+    paths = set()
+    for source in sources:
+        if os.path.isdir(source):
+            pattern = os.path.join(source, "**", "*")
+            matches = glob.glob(pattern, recursive=True)
+        else:
+            matches = glob.glob(source, recursive=True)
+        for path in matches:
+            if path.lower().endswith(".pdf") and os.path.isfile(path):
+                paths.add(os.path.abspath(path))
+    return sorted(paths)
+
+
+def name_from_path(path):
+    """Best-effort candidate name from a file name like "jane_doe-cv.pdf"."""
+    stem = os.path.splitext(os.path.basename(path))[0]
+    return " ".join(stem.replace("_", " ").replace("-", " ").split()).title() or stem
+
+
+def already_ingested(conn, job_id):
+    rows = conn.execute(
+        "SELECT source_path FROM candidates WHERE job_id = ? AND source_path IS NOT NULL",
+        (job_id,),
+    )
+    return {row[0] for row in rows}
+
+
+def _scan_one(args):
+    """Pool worker: copy a PDF into uploads/.incoming, hashing it, and scan the copy.
+
+    Returns (path, (temp_path, digest, size), result, error).
+    """
+    path, job_keywords, all_jobs, upload_folder = args
+    incoming = None
+    try:
+        incoming = upload_store.copy_to_incoming(path, upload_folder)
+        incoming.file.close()
+        result = scan_cv(incoming.path, job_keywords, all_jobs)
+        return path, (incoming.path, incoming.hexdigest(), incoming.size), result, None
+    except Exception as e:
+        if incoming:
+            incoming.discard()
+        return path, None, None, str(e)
+
+
+def write_batch(conn, rows, results, files=(), upload_folder=UPLOAD_FOLDER):
+    """Insert candidate rows plus their keyword results and score matrix.
+
+    results maps each row's source path to its scan result.
+
+    files are the (temp_path, digest, size) copies the rows refer to; they
+    are moved into content-addressed storage in the same transaction.
+    """
+    with conn:
+        for temp_path, digest, size in files:
+            upload_store.place_file(conn, temp_path, digest, size, upload_folder)
+        conn.executemany(
+            """INSERT INTO candidates (name, job_id, pdf_filename, cv_text, score,
+               keywords_fingerprint, extraction_partial, source_path)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+            rows,
+        )
+        # executemany() does not report row ids; look them up by source path
+        paths = list(results)
+        ids = conn.execute(
+            f"""SELECT id, source_path FROM candidates WHERE job_id = ?
+                AND source_path IN ({",".join("?" * len(paths))})""",
+            [rows[0][1], *paths],
+        ).fetchall()
+        candidate_keywords.store_many(conn, [
+            (candidate_id, results[path]["matched_keywords"], results[path]["missing_keywords"])
+            for candidate_id, path in ids
+        ])
+        for candidate_id, path in ids:
+            if "job_scores" in results[path]:
+                score_matrix.store(conn, candidate_id, results[path]["job_scores"])
+
+
+def ingest(sources, job_id, workers=None, batch_size=50, db_path=None,
+           upload_folder=UPLOAD_FOLDER, out=sys.stdout):
+    """Scan and store every new PDF under sources. Returns (ingested, failed, skipped)."""
+    db.init_db(db_path)
+    job_ad = get_job_ad(job_id, db_path)
+    if not job_ad:
+        raise ValueError(f"Unknown job: {job_id}")
+
+    os.makedirs(upload_folder, exist_ok=True)
+    conn = db.connect(db_path)
+
+    paths = find_pdfs(sources)
+    done = already_ingested(conn, job_id)
+    todo = [p for p in paths if p not in done]
+    skipped = len(paths) - len(todo)
+    print(f"{len(paths)} PDFs found, {skipped} already ingested, {len(todo)} to scan", file=out)
+
+    ingested = failed = 0
+    batch = []
+    batch_files = []
+    batch_results = {}
+    started = time.monotonic()
+    all_jobs = score_matrix.all_job_keywords(get_job_ads(db_path))
+    tasks = ((path, job_ad["keywords"], all_jobs, upload_folder) for path in todo)
+
+    with multiprocessing.Pool(workers) as pool:
+        for path, stored, result, error in pool.imap_unordered(_scan_one, tasks, chunksize=4):
+            if error is not None:
+                failed += 1
+                print(f"  failed: {path}: {error}", file=out)
+                continue
+            batch.append((
+                name_from_path(path),
+                job_id,
+                upload_store.stored_filename(stored[1]),
+                result["cv_text"],
+                result["score"],
+                result["keywords_fingerprint"],
+                result["extraction_partial"],
+                path,
+            ))
+            batch_files.append(stored)
+            batch_results[path] = result
+            if len(batch) >= batch_size:
+                write_batch(conn, batch, batch_results, batch_files, upload_folder)
+                ingested += len(batch)
+                batch = []
+                batch_files = []
+                batch_results = {}
+                elapsed = time.monotonic() - started
+                print(f"  {ingested + failed}/{len(todo)} files, {ingested / elapsed:.1f} files/s", file=out)
+
+    if batch:
+        write_batch(conn, batch, batch_results, batch_files, upload_folder)
+        ingested += len(batch)
+    conn.close()
+
+    elapsed = time.monotonic() - started
+    rate = ingested / elapsed if elapsed else 0.0
+    print(f"Ingested {ingested}, failed {failed}, skipped {skipped} in {elapsed:.1f}s ({rate:.1f} files/s)", file=out)
+    return ingested, failed, skipped
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk-import CV PDFs for a job.")
+    parser.add_argument("sources", nargs="+", help="directories or glob patterns of PDFs")
+    parser.add_argument("--job", required=True, help="job id to score against")
+    parser.add_argument("--workers", type=int, default=None, help="scan processes (default: all cores)")
+    parser.add_argument("--batch-size", type=int, default=50, help="rows per database transaction")
+    parser.add_argument("--db", default=None, help="SQLite database path")
+    parser.add_argument("--uploads", default=UPLOAD_FOLDER, help="folder to copy PDFs into")
+    parser.add_argument("--text-only", action="store_true",
+                        help="skip layout analysis during extraction (faster)")
+    args = parser.parse_args(argv)
+
+    if args.text_only:
+        # Set in the environment too so spawned workers pick it up
+        os.environ["EXTRACT_MODE"] = extraction.MODE = extraction.MODE_TEXT
+
+    try:
+        ingest(args.sources, args.job, args.workers, args.batch_size, args.db, args.uploads)
+    except ValueError as e:
+        parser.error(str(e))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,32 @@
+"""Job ads, stored in SQLite and cached in memory.
+
+    python job_ads.py list
+    python job_ads.py dump jobs.json
+    python job_ads.py load jobs.json [--replace]
+
+Roles live in the job_ads table, so adding or editing one needs no deploy or
+restart. JOB_ADS below is only the seed for a fresh database. Every change
+to the table bumps job_ads_meta.version (via triggers) and the changed row's
+own version; each process polls the global stamp at most every
+RELOAD_INTERVAL seconds and re-reads only the rows whose version moved.
+
+A job's keywords may include a "matching" object to opt in to whole-word,
+stemmed, typo-tolerant and synonym matching (see matcher.TokenMatcher).
+"""
+
+import argparse
+import json
+import os
+import threading
+import time
+
+import db
+from matcher import MATCHING_OPTIONS, MAX_EDITS, split_tiers
+
+# Seconds between checks of the version stamp; 0 checks on every read
+RELOAD_INTERVAL = float(os.environ.get("JOB_ADS_RELOAD_SECONDS", "1"))
+
+# Seed data for a new database; edit roles with the CLI above, not here
 JOB_ADS = {
     "fullstack": {
         "id": "fullstack",
@@ -168,9 +197,224 @@ JOB_ADS = {
 }
 
 
-def get_job_ads():
-    return JOB_ADS
+_FIELDS = ("id", "title", "company", "description", "keywords")
+
+
+def _from_row(row):
+    job_ad = {field: row[field] for field in _FIELDS}
+    job_ad["keywords"] = json.loads(row["keywords"])
+    return job_ad
+
+
+class JobAdStore:
+    """In-memory copy of the job_ads table, refreshed by version stamp.
+
+    Matchers are compiled lazily and cached by keyword set (see
+    matcher.get_matcher), so only roles whose keywords changed are rebuilt.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self.version = None
+        self._ads = {}
+        self._row_versions = {}
+        self._checked = 0.0
+        self._lock = threading.Lock()
+
+    def all(self):
+        self.refresh()
+        return self._ads
+
+    def refresh(self, force=False):
+        if not force and self.version is not None and time.monotonic() - self._checked < RELOAD_INTERVAL:
+            return
+        with self._lock:
+            pool = db.get_pool(self.path)
+            conn = pool.acquire()
+            try:
+                meta = conn.execute("SELECT version, seeded FROM job_ads_meta").fetchone()
+                if not meta["seeded"]:
+                    seed(conn)
+                    meta = conn.execute("SELECT version, seeded FROM job_ads_meta").fetchone()
+                if meta["version"] != self.version:
+                    self._reload(conn)
+                    self.version = meta["version"]
+            finally:
+                pool.release(conn)
+            self._checked = time.monotonic()
+
+    def _reload(self, conn):
+        rows = conn.execute("SELECT id, version FROM job_ads ORDER BY position, id").fetchall()
+        changed = [row["id"] for row in rows if self._row_versions.get(row["id"]) != row["version"]]
+        fresh = {}
+        for start in range(0, len(changed), 500):
+            ids = changed[start:start + 500]
+            for row in conn.execute(
+                f"SELECT * FROM job_ads WHERE id IN ({','.join('?' * len(ids))})", ids
+            ):
+                fresh[row["id"]] = _from_row(row)
+        # Swap in a new dict so readers never see a half-updated one
+        self._ads = {row["id"]: fresh.get(row["id"]) or self._ads[row["id"]] for row in rows}
+        self._row_versions = {row["id"]: row["version"] for row in rows}
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_store(db_path=None):
+    path = db_path or db.DATABASE
+    with _stores_lock:
+        store = _stores.get(path)
+        if store is None:
+            store = _stores[path] = JobAdStore(path)
+        return store
+
+
+def get_job_ads(db_path=None):
+    return get_store(db_path).all()
+
+
+def get_job_ad(job_id, db_path=None):
+    return get_job_ads(db_path).get(job_id)
+
+
+def validate(job_ad):
+    """Raise ValueError unless job_ad has an id, title, company and keywords."""
+    if not isinstance(job_ad, dict):
+        raise ValueError(f"Job ad must be an object, not {job_ad!r:.80}")
+    for field in ("id", "title", "company"):
+        if not isinstance(job_ad.get(field), str) or not job_ad[field].strip():
+            raise ValueError(f"Job ad is missing {field!r}: {job_ad!r:.80}")
+    keywords = job_ad.get("keywords")
+    if isinstance(keywords, dict):
+        tiers = [keywords.get("must_have", []), keywords.get("nice_to_have", [])]
+    else:
+        tiers = [keywords]
+    if not all(isinstance(tier, list) and all(isinstance(kw, str) for kw in tier) for tier in tiers):
+        raise ValueError(f"Job ad {job_ad['id']!r} needs a keyword list or must_have/nice_to_have lists")
+    if isinstance(keywords, dict) and "matching" in keywords:
+        validate_matching(job_ad["id"], keywords["matching"])
+
+
+def validate_matching(job_id, options):
+    """Raise ValueError unless options is a valid keywords["matching"] dict."""
+    if not isinstance(options, dict):
+        raise ValueError(f"Job ad {job_id!r}: matching must be an object")
+    unknown = set(options) - set(MATCHING_OPTIONS)
+    if unknown:
+        raise ValueError(f"Job ad {job_id!r}: unknown matching options {sorted(unknown)}")
+    for flag in ("word_boundary", "stemming"):
+        if not isinstance(options.get(flag, False), bool):
+            raise ValueError(f"Job ad {job_id!r}: matching.{flag} must be true or false")
+    max_edits = options.get("max_edits", 0)
+    if isinstance(max_edits, bool) or not isinstance(max_edits, int) or not 0 <= max_edits <= MAX_EDITS:
+        raise ValueError(f"Job ad {job_id!r}: matching.max_edits must be 0 to {MAX_EDITS}")
+    synonyms = options.get("synonyms", {})
+    if not isinstance(synonyms, dict) or not all(
+        isinstance(aliases, list) and all(isinstance(alias, str) for alias in aliases)
+        for aliases in synonyms.values()
+    ):
+        raise ValueError(f"Job ad {job_id!r}: matching.synonyms must map keywords to lists of strings")
+
+
+def save_job_ads(conn, job_ads, replace=False):
+    """Insert or update job ads (a list, or a dict keyed by id). Returns rows changed.
+
+    Unchanged ads keep their version, so their cached matchers stay valid.
+    With replace=True, ads not in job_ads are deleted.
+    """
+    with conn:
+        return _upsert_job_ads(conn, job_ads, replace)
+
+
+def _upsert_job_ads(conn, job_ads, replace=False):
+    """save_job_ads() without the commit."""
+    if isinstance(job_ads, dict):
+        job_ads = [{"id": job_id, **job_ad} for job_id, job_ad in job_ads.items()]
+    for job_ad in job_ads:
+        validate(job_ad)
+    rows = [
+        (ad["id"], ad["title"], ad["company"], ad.get("description", ""),
+         json.dumps(ad["keywords"]), position)
+        for position, ad in enumerate(job_ads)
+    ]
+    changed = conn.executemany(
+        """INSERT INTO job_ads (id, title, company, description, keywords, position)
+           VALUES (?, ?, ?, ?, ?, ?)
+           ON CONFLICT (id) DO UPDATE SET title = excluded.title,
+               company = excluded.company, description = excluded.description,
+               keywords = excluded.keywords, position = excluded.position
+           WHERE (title, company, description, keywords, position) IS NOT
+                 (excluded.title, excluded.company, excluded.description,
+                  excluded.keywords, excluded.position)""",
+        rows,
+    ).rowcount
+    if replace:
+        ids = [row[0] for row in rows]
+        changed += conn.execute(
+            f"DELETE FROM job_ads WHERE id NOT IN ({','.join('?' * len(ids))})", ids
+        ).rowcount
+    return changed
+
+
+def seed(conn):
+    """Load JOB_ADS into an empty store, once per database.
+
+    The claim and the inserts share one write transaction, so a failed seed
+    leaves the database unseeded rather than claimed and empty.
+    """
+    with conn:
+        conn.execute("BEGIN IMMEDIATE")
+        claimed = conn.execute("UPDATE job_ads_meta SET seeded = 1 WHERE seeded = 0").rowcount
+        if claimed and not conn.execute("SELECT COUNT(*) FROM job_ads").fetchone()[0]:
+            _upsert_job_ads(conn, JOB_ADS)
+
+
+def dump_job_ads(conn):
+    rows = conn.execute("SELECT * FROM job_ads ORDER BY position, id")
+    return [_from_row(row) for row in rows]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Manage the stored job ads.")
+    parser.add_argument("--db", default=None, help="SQLite database path")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("list", help="show stored job ads")
+    dump = commands.add_parser("dump", help="write job ads as JSON")
+    dump.add_argument("path", nargs="?", help="output file (default: stdout)")
+    load = commands.add_parser("load", help="add or update job ads from JSON")
+    load.add_argument("path", help="JSON list of job ads, or an object keyed by id")
+    load.add_argument("--replace", action="store_true", help="delete job ads missing from the file")
+    args = parser.parse_args(argv)
+
+    db.init_db(args.db)
+    get_store(args.db).refresh(force=True)
+    conn = db.connect(args.db)
+    try:
+        if args.command == "list":
+            for job_ad in dump_job_ads(conn):
+                keywords = job_ad["keywords"]
+                count = sum(len(tier) for tier in split_tiers(keywords))
+                print(f"{job_ad['id']}: {job_ad['title']} at {job_ad['company']} ({count} keywords)")
+        elif args.command == "dump":
+            data = json.dumps(dump_job_ads(conn), indent=2, ensure_ascii=False)
+            if args.path:
+                with open(args.path, "w") as f:
+                    f.write(data + "\n")
+            else:
+                print(data)
+        else:
+            with open(args.path) as f:
+                job_ads = json.load(f)
+            try:
+                changed = save_job_ads(conn, job_ads, args.replace)
+            except ValueError as e:
+                parser.error(str(e))
+            print(f"{changed} job ads added, changed or removed")
+    finally:
+        conn.close()
 
 
-def get_job_ad(job_id):
-    return JOB_ADS.get(job_id)
+if __name__ == "__main__":
+    main()
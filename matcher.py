@@ -0,0 +1,446 @@
+import hashlib
+import json
+import re
+from collections import deque
+from functools import lru_cache
+from itertools import combinations
+
+# Per-job options under keywords["matching"]; see TokenMatcher
+MATCHING_OPTIONS = ("word_boundary", "stemming", "max_edits", "synonyms")
+MAX_EDITS = 2
+# A keyword term gets one allowed typo per this many characters (up to max_edits),
+# so short terms like "go" or "java" never match fuzzily
+CHARS_PER_EDIT = 5
+# Distinct CV words remembered per job with typo matching
+NEAR_TERMS_CACHE_SIZE = 100000
+
+TOKEN_RE = re.compile(r"[^\s/]+")
+STEM_SUFFIXES = (
+    ("ings", ""), ("ing", ""), ("ments", ""), ("ment", ""),
+    ("ied", "y"), ("ies", "y"), ("ed", ""), ("s", ""),
+)
+# A doubled final consonant is undone after these, so "planning" -> "plan"
+UNDOUBLE_AFTER = {"ings", "ing", "ed"}
+
+
+def normalize_text(text):
+    """Lowercase and collapse whitespace for matching."""
+    text = text.lower()
+    text = re.sub(r"[^\w\s/+#]", " ", text)
+    text = re.sub(r"\s+", " ", text)
+    return text.strip()
+
+
+class KeywordMatcher:
+    """Aho-Corasick automaton over a job's normalized keywords.
+
+    Built once per keyword set, it finds every must-have and nice-to-have
+    keyword in a single pass over the normalized CV text. A keyword counts as
+    found exactly when ``normalize_text(keyword) in normalize_text(cv_text)``.
+    """
+
+    def __init__(self, must_have, nice_to_have):
+        self.must_have = list(must_have)
+        self.nice_to_have = list(nice_to_have)
+
+        self.patterns = []
+        pattern_ids = {}
+        self.tiers = {}
+        for tier, keywords in (("must_have", self.must_have), ("nice_to_have", self.nice_to_have)):
+            entries = []
+            for keyword in keywords:
+                normalized = normalize_text(keyword)
+                if normalized not in pattern_ids:
+                    pattern_ids[normalized] = len(self.patterns)
+                    self.patterns.append(normalized)
+                entries.append((keyword, pattern_ids[normalized]))
+            self.tiers[tier] = entries
+
+        # An empty pattern is a substring of every text.
+        self.always_found = {pid for pattern, pid in pattern_ids.items() if not pattern}
+        self._build([(p, pid) for p, pid in pattern_ids.items() if p])
+
+    def _build(self, patterns):
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [()]
+        for pattern, pid in patterns:
+            state = 0
+            for char in pattern:
+                nxt = self.goto[state].get(char)
+                if nxt is None:
+                    nxt = len(self.goto)
+                    self.goto[state][char] = nxt
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.output.append(())
+                state = nxt
+            self.output[state] = self.output[state] + (pid,)
+
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, nxt in self.goto[state].items():
+                queue.append(nxt)
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[nxt] = self.goto[fallback].get(char, 0)
+                self.output[nxt] = self.output[nxt] + self.output[self.fail[nxt]]
+
+    def find(self, normalized_text):
+        """Return the set of pattern ids that occur in already-normalized text."""
+        found = set(self.always_found)
+        remaining = len(self.patterns) - len(found)
+        if not remaining:
+            return found
+        goto, fail, output = self.goto, self.fail, self.output
+        state = 0
+        for char in normalized_text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if output[state]:
+                for pid in output[state]:
+                    if pid not in found:
+                        found.add(pid)
+                        remaining -= 1
+                if not remaining:
+                    break
+        return found
+
+    def match(self, normalized_text):
+        """Split each tier into (matched, missing) lists, preserving keyword order.
+
+        Returns {"must_have": (matched, missing), "nice_to_have": (matched, missing)}.
+        """
+        found = self.find(normalized_text)
+        result = {}
+        for tier, entries in self.tiers.items():
+            matched = [kw for kw, pid in entries if pid in found]
+            missing = [kw for kw, pid in entries if pid not in found]
+            result[tier] = (matched, missing)
+        return result
+
+
+class MultiJobMatcher:
+    """One automaton over the keywords of several jobs.
+
+    Keywords shared between jobs become a single pattern, and each pattern
+    maps back to the jobs that list it, so scoring a CV against every open
+    role costs one pass over the text instead of one pass per job. Jobs with
+    matching options get a TokenMatcher instead, all sharing one TokenIndex.
+    """
+
+    def __init__(self, keyword_sets):
+        keyword_sets = list(keyword_sets)
+        plain = [kw for kw in keyword_sets if matching_options(kw) is None]
+        self.automaton = KeywordMatcher(
+            [kw for job_keywords in plain for tier in split_tiers(job_keywords) for kw in tier], []
+        )
+        pattern_ids = {pattern: pid for pid, pattern in enumerate(self.automaton.patterns)}
+
+        self.jobs = []
+        self.pattern_jobs = {}
+        for index, job_keywords in enumerate(keyword_sets):
+            if matching_options(job_keywords) is not None:
+                self.jobs.append(get_matcher(job_keywords))
+                continue
+            tiers = {}
+            for tier, keywords in zip(("must_have", "nice_to_have"), split_tiers(job_keywords)):
+                entries = [(kw, pattern_ids[normalize_text(kw)]) for kw in keywords]
+                for _, pid in entries:
+                    self.pattern_jobs.setdefault(pid, set()).add(index)
+                tiers[tier] = entries
+            self.jobs.append(tiers)
+        self.has_plain = bool(plain)
+        self.has_token = len(plain) < len(keyword_sets)
+
+    def match(self, normalized_text):
+        """Return one KeywordMatcher.match()-style dict per keyword set, in order."""
+        found = self.automaton.find(normalized_text) if self.has_plain else set()
+        token_index = TokenIndex(normalized_text) if self.has_token else None
+        hit_jobs = set()
+        for pid in found:
+            hit_jobs.update(self.pattern_jobs.get(pid, ()))
+
+        results = []
+        for index, tiers in enumerate(self.jobs):
+            if isinstance(tiers, TokenMatcher):
+                results.append(tiers.match(normalized_text, token_index))
+                continue
+            result = {}
+            for tier, entries in tiers.items():
+                if index in hit_jobs:
+                    matched = [kw for kw, pid in entries if pid in found]
+                    missing = [kw for kw, pid in entries if pid not in found]
+                else:
+                    matched, missing = [], [kw for kw, _ in entries]
+                result[tier] = (matched, missing)
+            results.append(result)
+        return results
+
+
+@lru_cache(maxsize=65536)
+def stem(token):
+    """Light suffix stripping, so "deploying", "deployed" and "deployments"
+    all become "deploy". Only used to compare words, never shown.
+    """
+    if len(token) <= 4 or not token.isalpha():
+        return token
+    for suffix, replacement in STEM_SUFFIXES:
+        if token.endswith(suffix) and len(token) - len(suffix) >= 3:
+            if suffix == "s" and token.endswith(("ss", "us", "is")):
+                break
+            token = token[:-len(suffix)] + replacement
+            if suffix in UNDOUBLE_AFTER and token[-1] == token[-2] and token[-1] not in "aeioulsfz":
+                token = token[:-1]
+            break
+    if token.endswith("e") and len(token) > 3:
+        token = token[:-1]
+    return token
+
+
+def deletes(word, edits):
+    """Every string made by deleting up to `edits` characters from word."""
+    variants = {word}
+    for count in range(1, min(edits, len(word)) + 1):
+        variants.update("".join(kept) for kept in combinations(word, len(word) - count))
+    return variants
+
+
+def edit_distance(a, b, limit):
+    """Edit distance counting adjacent transpositions, or limit + 1 if above limit."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous2 = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = a[i - 1] != b[j - 1]
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+        previous2, previous = previous, current
+    return previous[-1] if previous[-1] <= limit else limit + 1
+
+
+def term_edits(term, max_edits):
+    """Typos allowed in a keyword term; none for numbers and versions like "es6"."""
+    if not term.isalpha():
+        return 0
+    return min(max_edits, len(term) // CHARS_PER_EDIT)
+
+
+class TokenIndex:
+    """Token indexes over one normalized CV, built lazily and shared by jobs.
+
+    Tokens are split on whitespace and "/". For each setting of stemming the
+    index holds the token sequence and where each distinct token occurs, so
+    keyword terms are found by dictionary lookups rather than text scans.
+    """
+
+    def __init__(self, normalized_text):
+        self.tokens = TOKEN_RE.findall(normalized_text)
+        self._sequences = {}
+        self._positions = {}
+
+    def sequence(self, stemming):
+        if stemming not in self._sequences:
+            self._sequences[stemming] = [stem(t) for t in self.tokens] if stemming else self.tokens
+        return self._sequences[stemming]
+
+    def positions(self, stemming):
+        """{token: [positions]} for the (stemmed) token sequence."""
+        if stemming not in self._positions:
+            positions = {}
+            for position, token in enumerate(self.sequence(stemming)):
+                positions.setdefault(token, []).append(position)
+            self._positions[stemming] = positions
+        return self._positions[stemming]
+
+
+class TokenMatcher:
+    """Whole-token keyword matching with optional stemming, typos and synonyms.
+
+    Used for jobs whose keywords carry a "matching" dict:
+
+        "matching": {
+            "word_boundary": true,        # whole tokens only: "go" no longer matches "google"
+            "stemming": true,             # "deployments" matches "deploy"
+            "max_edits": 1,               # typos, 1 per 5 letters of a term, at most this many
+            "synonyms": {"go": ["golang"], "react": ["reactjs", "react.js"]}
+        }
+
+    Any option switches the job to whole-token matching. A keyword (or any
+    of its synonyms) is found when its terms appear as consecutive tokens.
+
+    Typos are found with a deletion neighbourhood: two words are within k
+    edits only if deleting at most k letters from each gives a common
+    string. The keyword side of that index is built here, once per job;
+    each distinct CV word is looked up in it once and the result remembered,
+    so a scan only pays for words this job has not seen before.
+    """
+
+    def __init__(self, must_have, nice_to_have, options):
+        self.must_have = list(must_have)
+        self.nice_to_have = list(nice_to_have)
+        self.stemming = bool(options.get("stemming"))
+        self.max_edits = int(options.get("max_edits") or 0)
+        synonyms = {
+            normalize_text(kw): [normalize_text(alias) for alias in aliases]
+            for kw, aliases in (options.get("synonyms") or {}).items()
+        }
+
+        # Each distinct phrase (a tuple of terms) is matched once per CV
+        self.phrases = []
+        phrase_ids = {}
+        self.tiers = {}
+        for tier, keywords in (("must_have", self.must_have), ("nice_to_have", self.nice_to_have)):
+            entries = []
+            for keyword in keywords:
+                normalized = normalize_text(keyword)
+                ids = []
+                for variant in [normalized, *synonyms.get(normalized, [])]:
+                    phrase = tuple(
+                        stem(t) if self.stemming else t for t in TOKEN_RE.findall(variant)
+                    )
+                    if phrase not in phrase_ids:
+                        phrase_ids[phrase] = len(self.phrases)
+                        self.phrases.append(phrase)
+                    ids.append(phrase_ids[phrase])
+                entries.append((keyword, tuple(ids)))
+            self.tiers[tier] = entries
+
+        # {deletion variant: [(term, edits allowed)]} for terms that allow typos,
+        # and {token length: edits} for the lengths a typo of some term can have
+        self.neighbourhood = {}
+        self.reach = {}
+        for term in {term for phrase in self.phrases for term in phrase}:
+            edits = term_edits(term, self.max_edits)
+            if edits:
+                for variant in deletes(term, edits):
+                    self.neighbourhood.setdefault(variant, []).append((term, edits))
+                for length in range(len(term) - edits, len(term) + edits + 1):
+                    self.reach[length] = max(self.reach.get(length, 0), edits)
+        self._near_terms = {}
+
+    def near_terms(self, token):
+        """Keyword terms a CV token is a typo of (other than itself), memoized."""
+        terms = self._near_terms.get(token)
+        if terms is None:
+            terms = set()
+            edits = self.reach.get(len(token), 0)
+            if edits and token.isalpha():
+                for variant in deletes(token, edits):
+                    for term, term_edit_limit in self.neighbourhood.get(variant, ()):
+                        if term != token and edit_distance(term, token, term_edit_limit) <= term_edit_limit:
+                            terms.add(term)
+            if len(self._near_terms) >= NEAR_TERMS_CACHE_SIZE:
+                self._near_terms.clear()
+            self._near_terms[token] = terms
+        return terms
+
+    def find(self, index):
+        """Return the set of phrase ids that occur in the indexed CV."""
+        sequence = index.sequence(self.stemming)
+        positions = index.positions(self.stemming)
+        # Every term stands for itself, plus any CV tokens that are typos of it
+        term_tokens = {}
+        if self.neighbourhood:
+            for token in positions:
+                for term in self.near_terms(token):
+                    term_tokens.setdefault(term, {term}).add(token)
+
+        found = set()
+        for pid, phrase in enumerate(self.phrases):
+            if not phrase:
+                found.add(pid)
+                continue
+            allowed = [term_tokens.get(term) or (term,) for term in phrase]
+            starts = [p for token in allowed[0] for p in positions.get(token, ())]
+            last = len(sequence) - len(phrase)
+            if any(
+                start <= last and all(sequence[start + i] in allowed[i] for i in range(1, len(phrase)))
+                for start in starts
+            ):
+                found.add(pid)
+        return found
+
+    def match(self, normalized_text, index=None):
+        """Same result shape as KeywordMatcher.match().
+
+        index is a TokenIndex over normalized_text, shared when several jobs
+        are matched against one CV.
+        """
+        found = self.find(index or TokenIndex(normalized_text))
+        result = {}
+        for tier, entries in self.tiers.items():
+            matched = [kw for kw, ids in entries if not found.isdisjoint(ids)]
+            missing = [kw for kw, ids in entries if found.isdisjoint(ids)]
+            result[tier] = (matched, missing)
+        return result
+
+
+def split_tiers(job_keywords):
+    """Return (must_have, nice_to_have) lists from a tiered dict or a flat list."""
+    if isinstance(job_keywords, dict):
+        return list(job_keywords.get("must_have", [])), list(job_keywords.get("nice_to_have", []))
+    return list(job_keywords), []
+
+
+def matching_options(job_keywords):
+    """A job's "matching" options, or None when it uses plain substring matching."""
+    if not isinstance(job_keywords, dict):
+        return None
+    options = job_keywords.get("matching") or {}
+    if not any(options.get(name) for name in MATCHING_OPTIONS):
+        return None
+    return options
+
+
+def _options_key(options):
+    return json.dumps(options, sort_keys=True) if options is not None else None
+
+
+def keywords_fingerprint(job_keywords):
+    """Stable hash of a job's keyword set; changes whenever scoring would."""
+    must_have, nice_to_have = split_tiers(job_keywords)
+    payload = json.dumps({"must_have": must_have, "nice_to_have": nice_to_have})
+    # Jobs without matching options keep the fingerprints they always had
+    options = matching_options(job_keywords)
+    if options is not None:
+        payload += _options_key(options)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+# Sized for hundreds of job ads; edited jobs get new keys and old ones age out
+@lru_cache(maxsize=1024)
+def _compile(must_have, nice_to_have, options_key=None):
+    if options_key is not None:
+        return TokenMatcher(must_have, nice_to_have, json.loads(options_key))
+    return KeywordMatcher(must_have, nice_to_have)
+
+
+def get_matcher(job_keywords):
+    """Return the compiled matcher for a job's keywords, building it on first use."""
+    must_have, nice_to_have = split_tiers(job_keywords)
+    return _compile(tuple(must_have), tuple(nice_to_have), _options_key(matching_options(job_keywords)))
+
+
+@lru_cache(maxsize=32)
+def _compile_multi(keyword_sets):
+    return MultiJobMatcher(
+        {"must_have": list(must), "nice_to_have": list(nice), "matching": json.loads(options_key or "{}")}
+        for must, nice, options_key in keyword_sets
+    )
+
+
+def get_multi_matcher(keyword_sets):
+    """Return the compiled matcher for a sequence of job keyword sets."""
+    return _compile_multi(tuple(
+        (*map(tuple, split_tiers(kw)), _options_key(matching_options(kw))) for kw in keyword_sets
+    ))
@@ -0,0 +1,166 @@
+"""In-process latency histograms and counters, rendered as Prometheus text.
+
+    with metrics.timed("scan_stage_seconds", stage="extract"):
+        ...
+
+Histograms keep a bounded window of recent samples for p50/p95/p99 plus a
+running count and sum, and are exported as Prometheus summaries. While a
+trace is active on the current thread (see trace()), every timed() block
+also appends (stage, seconds) to it, which is how per-request breakdowns
+and scan timings from worker processes are collected.
+"""
+
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+QUANTILES = (0.5, 0.95, 0.99)
+WINDOW = 2048
+
+_lock = threading.Lock()
+_histograms = {}
+_counters = {}
+_gauges = {}
+_collectors = []
+_help = {}
+_local = threading.local()
+
+
+def _key(labels):
+    return tuple(sorted(labels.items()))
+
+
+class Histogram:
+    def __init__(self):
+        self.samples = deque(maxlen=WINDOW)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, value):
+        self.samples.append(value)
+        self.count += 1
+        self.total += value
+
+    def quantiles(self):
+        ordered = sorted(self.samples)
+        if not ordered:
+            return {q: 0.0 for q in QUANTILES}
+        return {q: ordered[min(len(ordered) - 1, int(q * len(ordered)))] for q in QUANTILES}
+
+
+def describe(name, text):
+    _help[name] = text
+
+
+def observe(name, value, **labels):
+    with _lock:
+        series = _histograms.setdefault(name, {})
+        histogram = series.get(_key(labels))
+        if histogram is None:
+            histogram = series[_key(labels)] = Histogram()
+        histogram.observe(value)
+
+
+def inc(name, amount=1, **labels):
+    with _lock:
+        series = _counters.setdefault(name, {})
+        series[_key(labels)] = series.get(_key(labels), 0) + amount
+
+
+def gauge(name, callback, help_text=None):
+    """Register a callable whose return value is reported at scrape time."""
+    _gauges[name] = callback
+    if help_text:
+        _help[name] = help_text
+
+
+def collector(callback, counters=()):
+    """Register a callable returning {metric name: value}, called once per scrape.
+
+    For metrics read from one source, so a scrape reads it once; describe()
+    them for help text. Names in counters are exported as counters, the rest
+    as gauges.
+    """
+    _collectors.append((callback, frozenset(counters)))
+
+
+@contextmanager
+def timed(name, **labels):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        observe(name, elapsed, **labels)
+        stages = getattr(_local, "stages", None)
+        if stages is not None:
+            stages.append((labels.get("stage", name), elapsed))
+
+
+@contextmanager
+def trace():
+    """Collect the (stage, seconds) pairs timed on this thread inside the block.
+
+    They are also passed on to an enclosing trace, if there is one.
+    """
+    previous = getattr(_local, "stages", None)
+    _local.stages = stages = []
+    try:
+        yield stages
+    finally:
+        _local.stages = previous
+        if previous is not None:
+            previous.extend(stages)
+
+
+def start_trace():
+    _local.stages = []
+
+
+def end_trace():
+    stages = getattr(_local, "stages", None) or []
+    _local.stages = None
+    return stages
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def render():
+    """All metrics in the Prometheus text exposition format."""
+    lines = []
+    with _lock:
+        for name in sorted(_counters):
+            if name in _help:
+                lines.append(f"# HELP {name} {_help[name]}")
+            lines.append(f"# TYPE {name} counter")
+            for key, value in sorted(_counters[name].items()):
+                lines.append(f"{name}{_labels(key)} {value}")
+        for name in sorted(_histograms):
+            if name in _help:
+                lines.append(f"# HELP {name} {_help[name]}")
+            lines.append(f"# TYPE {name} summary")
+            for key, histogram in sorted(_histograms[name].items()):
+                for q, value in histogram.quantiles().items():
+                    lines.append(f"{name}{_labels(key, [('quantile', q)])} {value:.6f}")
+                lines.append(f"{name}_sum{_labels(key)} {histogram.total:.6f}")
+                lines.append(f"{name}_count{_labels(key)} {histogram.count}")
+    collected = {name: (callback(), "gauge") for name, callback in _gauges.items()}
+    for callback, counters in _collectors:
+        for name, value in callback().items():
+            collected[name] = (value, "counter" if name in counters else "gauge")
+    for name, (value, kind) in sorted(collected.items()):
+        if name in _help:
+            lines.append(f"# HELP {name} {_help[name]}")
+        lines.append(f"# TYPE {name} {kind}")
+        lines.append(f"{name} {value}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,147 @@
+"""Re-score stored candidates after a job's keywords change.
+
+    python rescore.py               # every job whose keywords changed
+    python rescore.py --job fullstack --dry-run
+
+Each candidate row records the fingerprint of the keyword set it was scored
+against. Rows whose fingerprint differs from the current job definition are
+re-matched from the stored cv_text in id-ordered batches, so the PDFs are
+never touched and the table is never loaded into memory at once. The score
+matrix (see score_matrix.py) is then brought up to date the same way; the
+admin's "Re-score" button runs the same sequence in the background.
+"""
+
+import argparse
+import time
+
+import candidate_keywords
+import db
+import score_matrix
+from job_ads import get_job_ads
+from matcher import keywords_fingerprint
+from scanner import scan_text
+
+BATCH_SIZE = 500
+
+_STALE = "job_id = ? AND status = 'done' AND keywords_fingerprint IS NOT ?"
+
+# {(database file, job_id): ((job revision, keywords fingerprint), stale count)}
+_stale_cache = {}
+
+
+def stale_counts(conn, job_ads=None):
+    """Return {job_id: number of rows scored against an outdated keyword set}.
+
+    Counts are cached per job until its analytics revision (bumped by every
+    finished scan, re-score and delete) or its keywords change.
+    """
+    job_ads = get_job_ads() if job_ads is None else job_ads
+    database = conn.execute("PRAGMA database_list").fetchone()[2]
+    revisions = dict(conn.execute("SELECT job_id, revision FROM job_stats").fetchall())
+    counts = {}
+    for job_id, job_ad in job_ads.items():
+        fingerprint = keywords_fingerprint(job_ad["keywords"])
+        stamp = (revisions.get(job_id, 0), fingerprint)
+        cached = _stale_cache.get((database, job_id))
+        if cached and cached[0] == stamp:
+            count = cached[1]
+        else:
+            count = conn.execute(
+                f"SELECT COUNT(*) FROM candidates WHERE {_STALE}", (job_id, fingerprint)
+            ).fetchone()[0]
+            _stale_cache[(database, job_id)] = (stamp, count)
+        if count:
+            counts[job_id] = count
+    return counts
+
+
+def rescore_job(conn, job_id, job_keywords, batch_size=BATCH_SIZE):
+    """Re-run matching and scoring for one job's stale rows. Returns the row count."""
+    fingerprint = keywords_fingerprint(job_keywords)
+    last_id = 0
+    total = 0
+    while True:
+        rows = conn.execute(
+            f"""SELECT id, cv_text FROM candidates WHERE {_STALE} AND id > ?
+                ORDER BY id LIMIT ?""",
+            (job_id, fingerprint, last_id, batch_size),
+        ).fetchall()
+        if not rows:
+            return total
+
+        updates = []
+        keywords = []
+        for row in rows:
+            result = scan_text(row["cv_text"], job_keywords)
+            updates.append((result["score"], fingerprint, row["id"]))
+            keywords.append((row["id"], result["matched_keywords"], result["missing_keywords"]))
+        with conn:
+            conn.executemany(
+                "UPDATE candidates SET score = ?, keywords_fingerprint = ? WHERE id = ?",
+                updates,
+            )
+            candidate_keywords.store_many(conn, keywords)
+        total += len(rows)
+        last_id = rows[-1]["id"]
+
+
+def rescore(conn, job_ids=None, batch_size=BATCH_SIZE, job_ads=None):
+    """Re-score every job (or just job_ids) whose keywords changed. Returns {job_id: rows}."""
+    job_ads = get_job_ads() if job_ads is None else job_ads
+    rescored = {}
+    for job_id, job_ad in job_ads.items():
+        if job_ids and job_id not in job_ids:
+            continue
+        count = rescore_job(conn, job_id, job_ad["keywords"], batch_size)
+        if count:
+            rescored[job_id] = count
+    return rescored
+
+
+def rescore_and_backfill(conn, job_ids=None, batch_size=BATCH_SIZE, job_ads=None, progress=None):
+    """rescore(), then score_matrix.backfill(). Returns ({job_id: rows}, candidates backfilled).
+
+    progress is passed on to backfill().
+    """
+    job_ads = get_job_ads() if job_ads is None else job_ads
+    rescored = rescore(conn, job_ids, batch_size, job_ads)
+    backfilled = (
+        score_matrix.backfill(conn, job_ads, batch_size, progress) if score_matrix.ENABLED else 0
+    )
+    return rescored, backfilled
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Re-score candidates whose job keywords changed.")
+    parser.add_argument("--job", action="append", help="only this job id (repeatable)")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="rows per transaction")
+    parser.add_argument("--db", default=None, help="SQLite database path")
+    parser.add_argument("--dry-run", action="store_true", help="only report stale row counts")
+    args = parser.parse_args(argv)
+
+    db.init_db(args.db)
+    conn = db.connect(args.db)
+    if args.dry_run:
+        counts = stale_counts(conn, get_job_ads(args.db))
+        for job_id, count in counts.items():
+            if not args.job or job_id in args.job:
+                print(f"{job_id}: {count} stale")
+        conn.close()
+        return
+
+    started = time.monotonic()
+    rescored, backfilled = rescore_and_backfill(
+        conn, args.job, args.batch_size, get_job_ads(args.db),
+        lambda done: print(f"{done} candidates' all-job scores refreshed", flush=True),
+    )
+    conn.close()
+    elapsed = time.monotonic() - started
+    for job_id, count in rescored.items():
+        print(f"{job_id}: re-scored {count}")
+    total = sum(rescored.values())
+    print(f"Re-scored {total} candidates and refreshed all-job scores for {backfilled} "
+          f"in {elapsed:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
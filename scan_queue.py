@@ -0,0 +1,183 @@
+"""Background CV scanning.
+
+The candidates table doubles as the queue: /submit inserts a row with
+status "pending" and hands the scan to a process pool. The worker writes the
+result back and flips the status to "done" (or "failed" with an error).
+Rows still pending after a restart are picked up again by resume_pending().
+"""
+
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import candidate_keywords
+import db
+import metrics
+import score_matrix
+from scanner import SCAN_STAGE_METRIC, scan_cv
+
+STATUS_PENDING = "pending"
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+
+# Number of scan worker processes; 0 scans inline in the request thread.
+SCAN_WORKERS = int(os.environ.get("SCAN_WORKERS", "2"))
+
+log = logging.getLogger(__name__)
+
+_executor = None
+_in_flight = 0
+_in_flight_lock = threading.Lock()
+
+metrics.describe("scans_total", "CV scans finished, by outcome.")
+metrics.gauge("scan_queue_depth", lambda: _in_flight,
+              "Scans submitted to the worker pool and not finished yet.")
+
+
+def get_executor():
+    """Return the shared worker pool, starting it on first use."""
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(
+            max_workers=SCAN_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _executor
+
+
+def shutdown():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=True)
+        _executor = None
+
+
+def create_pending(conn, name, job_id, pdf_filename):
+    """Insert a candidate row awaiting its scan and return its id."""
+    cursor = conn.execute(
+        """INSERT INTO candidates (name, job_id, pdf_filename, cv_text, score, status)
+           VALUES (?, ?, ?, '', 0, ?)""",
+        (name, job_id, pdf_filename, STATUS_PENDING),
+    )
+    conn.commit()
+    return cursor.lastrowid
+
+
+def store_result(conn, candidate_id, result):
+    cursor = conn.execute(
+        """UPDATE candidates SET cv_text = ?, score = ?, keywords_fingerprint = ?,
+           extraction_partial = ?, status = ?, error = NULL
+           WHERE id = ? AND status = ?""",
+        (
+            result["cv_text"],
+            result["score"],
+            result["keywords_fingerprint"],
+            result["extraction_partial"],
+            STATUS_DONE,
+            candidate_id,
+            STATUS_PENDING,
+        ),
+    )
+    # Nothing to attach results to if the row was deleted meanwhile
+    if cursor.rowcount:
+        candidate_keywords.store(
+            conn, candidate_id, result["matched_keywords"], result["missing_keywords"]
+        )
+        if "job_scores" in result:
+            score_matrix.store(conn, candidate_id, result["job_scores"])
+    conn.commit()
+
+
+def mark_failed(conn, candidate_id, error):
+    conn.execute(
+        "UPDATE candidates SET status = ?, error = ? WHERE id = ? AND status = ?",
+        (STATUS_FAILED, error, candidate_id, STATUS_PENDING),
+    )
+    conn.commit()
+
+
+def _track_in_flight(delta):
+    global _in_flight
+    with _in_flight_lock:
+        _in_flight += delta
+
+
+def run_scan(db_path, candidate_id, pdf_path, job_keywords, all_jobs=None):
+    """Worker entry point: scan one CV and record the outcome.
+
+    all_jobs ({job_id: keywords}) also fills the candidate's score matrix.
+    Returns (status, stage timings) so a parent process can record metrics.
+    """
+    pool = db.get_pool(db_path)
+    conn = pool.acquire()
+    try:
+        with metrics.trace() as stages:
+            try:
+                result = scan_cv(pdf_path, job_keywords, all_jobs)
+            except Exception as e:
+                mark_failed(conn, candidate_id, str(e))
+                return STATUS_FAILED, stages
+            with metrics.timed(SCAN_STAGE_METRIC, stage="store"):
+                store_result(conn, candidate_id, result)
+        return STATUS_DONE, stages
+    finally:
+        pool.release(conn)
+
+
+def enqueue(candidate_id, pdf_path, job_keywords, db_path=None, all_jobs=None):
+    """Schedule a scan for a pending candidate row."""
+    global _executor
+    db_path = db_path or db.DATABASE
+    if SCAN_WORKERS <= 0:
+        status, _ = run_scan(db_path, candidate_id, pdf_path, job_keywords, all_jobs)
+        metrics.inc("scans_total", status=status)
+        return
+
+    try:
+        future = get_executor().submit(run_scan, db_path, candidate_id, pdf_path, job_keywords, all_jobs)
+    except BrokenProcessPool:
+        # A worker died; start a fresh pool rather than failing every later scan
+        _executor = None
+        future = get_executor().submit(run_scan, db_path, candidate_id, pdf_path, job_keywords, all_jobs)
+    _track_in_flight(1)
+
+    def _on_done(f):
+        _track_in_flight(-1)
+        # run_scan records its own failures; this only catches a dead worker.
+        if f.exception() is not None:
+            log.error("Scan of candidate %s crashed: %s", candidate_id, f.exception())
+            metrics.inc("scans_total", status=STATUS_FAILED)
+            conn = db.connect(db_path)
+            try:
+                mark_failed(conn, candidate_id, f"Scan worker crashed: {f.exception()}")
+            finally:
+                conn.close()
+            return
+        # Stage timings were measured in the worker process; record them here
+        status, stages = f.result()
+        metrics.inc("scans_total", status=status)
+        for stage, seconds in stages:
+            metrics.observe(SCAN_STAGE_METRIC, seconds, stage=stage)
+
+    future.add_done_callback(_on_done)
+
+
+def resume_pending(upload_folder, get_job_ad, db_path=None, all_jobs=None):
+    """Re-enqueue candidates left pending by a previous run. Returns the count."""
+    conn = db.connect(db_path)
+    rows = conn.execute(
+        "SELECT id, job_id, pdf_filename FROM candidates WHERE status = ?",
+        (STATUS_PENDING,),
+    ).fetchall()
+    for row in rows:
+        job_ad = get_job_ad(row["job_id"])
+        if not job_ad:
+            mark_failed(conn, row["id"], f"Unknown job: {row['job_id']}")
+            continue
+        pdf_path = os.path.join(upload_folder, row["pdf_filename"])
+        enqueue(row["id"], pdf_path, job_ad["keywords"], db_path, all_jobs)
+    conn.close()
+    return len(rows)
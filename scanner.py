@@ -1,27 +1,29 @@
+import html
 import re
-import pdfplumber
+from functools import lru_cache
+
+import extract_cache
+import metrics
+from extraction import extract_pdf
+from matcher import (
+    get_matcher,
+    get_multi_matcher,
+    keywords_fingerprint,
+    matching_options,
+    normalize_text,
+    split_tiers,
+)
 
 MUST_HAVE_WEIGHT = 3
 NICE_TO_HAVE_WEIGHT = 1
 
-
-def extract_text_from_pdf(pdf_path):
-    """Extract all text from a PDF file using pdfplumber."""
-    text = ""
-    with pdfplumber.open(pdf_path) as pdf:
-        for page in pdf.pages:
-            page_text = page.extract_text()
-            if page_text:
-                text += page_text + "\n"
-    return text.strip()
+SCAN_STAGE_METRIC = "scan_stage_seconds"
+metrics.describe(SCAN_STAGE_METRIC, "Time spent in each stage of a CV scan.")
 
 
-def normalize_text(text):
-    """Lowercase and collapse whitespace for matching."""
-    text = text.lower()
-    text = re.sub(r"[^\w\s/+#]", " ", text)
-    text = re.sub(r"\s+", " ", text)
-    return text.strip()
+def extract_text_from_pdf(pdf_path):
+    """Extract text from a PDF file with the extraction backend, within its budgets."""
+    return extract_pdf(pdf_path)["text"]
 
 
 def match_keywords(cv_text, keywords):
@@ -29,19 +31,7 @@ def match_keywords(cv_text, keywords):
 
     Returns (matched, missing) lists.
     """
-    normalized_cv = normalize_text(cv_text)
-
-    matched = []
-    missing = []
-
-    for keyword in keywords:
-        normalized_kw = normalize_text(keyword)
-        if normalized_kw in normalized_cv:
-            matched.append(keyword)
-        else:
-            missing.append(keyword)
-
-    return matched, missing
+    return get_matcher(keywords).match(normalize_text(cv_text))["must_have"]
 
 
 def compute_score(matched, total_keywords):
@@ -77,46 +67,157 @@ def generate_suggestions(missing_must_have, missing_nice_to_have):
     return suggestions
 
 
-def highlight_keywords_in_text(cv_text, matched_keywords):
-    """Wrap matched keywords in <mark> tags for display."""
-    highlighted = cv_text
-    for keyword in sorted(matched_keywords, key=len, reverse=True):
-        pattern = re.compile(re.escape(keyword), re.IGNORECASE)
-        highlighted = pattern.sub(
-            lambda m: f"<mark>{m.group()}</mark>", highlighted
-        )
-    return highlighted
+def _trie_regex(node):
+    """Regex for a character trie; longer continuations are tried first."""
+    branches = [re.escape(char) + _trie_regex(child) for char, child in sorted(node.items()) if char]
+    if not branches:
+        return ""
+    body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+    if "" in node:
+        body = f"(?:{body})?"
+    return body
 
 
-def scan_cv(pdf_path, job_keywords):
+@lru_cache(maxsize=256)
+def _highlight_pattern(keywords, whole_words=False):
+    # One alternation factored as a trie, so each position costs a single
+    # descent and "project management" wins over "project" at the same spot.
+    trie = {}
+    for keyword in keywords:
+        node = trie
+        for char in keyword.lower():
+            node = node.setdefault(char, {})
+        node[""] = {}
+    pattern = _trie_regex(trie)
+    if whole_words:
+        pattern = rf"(?<!\w)(?:{pattern})(?!\w)"
+    return re.compile(pattern, re.IGNORECASE)
+
+
+def highlight_terms(job_keywords, matched_keywords):
+    """(strings to highlight, whole words only?) for a job's matched keywords.
+
+    Jobs with matching options (see matcher.TokenMatcher) match whole tokens
+    and also highlight the synonyms of matched keywords.
+    """
+    options = matching_options(job_keywords)
+    if options is None:
+        return tuple(matched_keywords), False
+    synonyms = {normalize_text(kw): aliases for kw, aliases in (options.get("synonyms") or {}).items()}
+    terms = list(matched_keywords)
+    for kw in matched_keywords:
+        terms.extend(synonyms.get(normalize_text(kw), []))
+    return tuple(dict.fromkeys(terms)), True
+
+
+def highlight_keywords_in_text(cv_text, matched_keywords, whole_words=False):
+    """HTML-escape the CV text and wrap matched keywords in <mark> tags, in one pass."""
+    keywords = frozenset(kw for kw in matched_keywords if kw)
+    if not keywords:
+        return html.escape(cv_text)
+
+    parts = []
+    pos = 0
+    for m in _highlight_pattern(keywords, whole_words).finditer(cv_text):
+        parts.append(html.escape(cv_text[pos:m.start()]))
+        parts.append(f"<mark>{html.escape(m.group())}</mark>")
+        pos = m.end()
+    parts.append(html.escape(cv_text[pos:]))
+    return "".join(parts)
+
+
+def scan_cv(pdf_path, job_keywords, all_jobs=None):
     """Full pipeline: extract text, match keywords, compute score, generate suggestions.
 
     job_keywords can be either:
     - A dict with "must_have" and "nice_to_have" lists (new tiered format)
     - A flat list of strings (old format — all treated as must-have)
+
+    Extracted text is cached by content hash, so re-uploads of the same PDF
+    skip straight to matching. "extraction_partial" is None, or the reason
+    extraction stopped early (page, character or time limit).
+
+    With all_jobs ({job_id: keywords}) the CV is also scored against every
+    one of those jobs in the same matching pass; see scan_text.
     """
-    cv_text = extract_text_from_pdf(pdf_path)
+    with metrics.timed(SCAN_STAGE_METRIC, stage="extract"):
+        extraction = extract_cache.get_or_extract(pdf_path, extract_pdf)
+    result = scan_text(extraction["text"], job_keywords, all_jobs)
+    result["extraction_partial"] = extraction["partial"]
+    return result
 
-    # Support both tiered dict and flat list formats
-    if isinstance(job_keywords, dict):
-        must_have = job_keywords.get("must_have", [])
-        nice_to_have = job_keywords.get("nice_to_have", [])
-    else:
-        must_have = list(job_keywords)
-        nice_to_have = []
-
-    matched_must, missing_must = match_keywords(cv_text, must_have)
-    matched_nice, missing_nice = match_keywords(cv_text, nice_to_have)
-
-    score = compute_tiered_score(
-        matched_must, len(must_have), matched_nice, len(nice_to_have)
-    )
-    suggestions = generate_suggestions(missing_must, missing_nice)
 
+def job_score(tiers, job_keywords):
+    """Score summary for one job from KeywordMatcher.match() output."""
+    must_have, nice_to_have = split_tiers(job_keywords)
+    matched_must, matched_nice = tiers["must_have"][0], tiers["nice_to_have"][0]
+    return {
+        "score": compute_tiered_score(matched_must, len(must_have), matched_nice, len(nice_to_have)),
+        "matched": len(matched_must) + len(matched_nice),
+        "total": len(must_have) + len(nice_to_have),
+        "keywords_fingerprint": keywords_fingerprint(job_keywords),
+    }
+
+
+def score_all_jobs(cv_text, all_jobs):
+    """Score already-extracted CV text against every job in one matching pass.
+
+    Returns {job_id: {"score", "matched", "total", "keywords_fingerprint"}}.
+    """
+    tiers = get_multi_matcher(all_jobs.values()).match(normalize_text(cv_text))
     return {
+        job_id: job_score(job_tiers, job_keywords)
+        for (job_id, job_keywords), job_tiers in zip(all_jobs.items(), tiers)
+    }
+
+
+def scan_text(cv_text, job_keywords, all_jobs=None):
+    """Match, score and suggest for already-extracted CV text (see scan_cv).
+
+    When all_jobs is given, the result also has "job_scores" as returned by
+    score_all_jobs, computed from the same normalization and matching pass.
+    """
+    # Support both tiered dict and flat list formats
+    must_have, nice_to_have = split_tiers(job_keywords)
+
+    # One pass over the normalized CV finds hits for both tiers (and every job)
+    with metrics.timed(SCAN_STAGE_METRIC, stage="match"):
+        normalized = normalize_text(cv_text)
+        if all_jobs:
+            # The all-jobs matcher is shared by every scan; the applied job is
+            # normally one of its jobs, so its tiers come from the same pass
+            all_tiers = get_multi_matcher(all_jobs.values()).match(normalized)
+            applied = next(
+                (i for i, keywords in enumerate(all_jobs.values()) if keywords == job_keywords), None
+            )
+            if applied is None:
+                tiers = get_matcher(job_keywords).match(normalized)
+            else:
+                tiers = all_tiers[applied]
+        else:
+            tiers = get_matcher(job_keywords).match(normalized)
+    matched_must, missing_must = tiers["must_have"]
+    matched_nice, missing_nice = tiers["nice_to_have"]
+
+    with metrics.timed(SCAN_STAGE_METRIC, stage="score"):
+        score = compute_tiered_score(
+            matched_must, len(must_have), matched_nice, len(nice_to_have)
+        )
+        suggestions = generate_suggestions(missing_must, missing_nice)
+        if all_jobs:
+            job_scores = {
+                job_id: job_score(job_tiers, keywords)
+                for (job_id, keywords), job_tiers in zip(all_jobs.items(), all_tiers)
+            }
+
+    result = {
         "cv_text": cv_text,
         "matched_keywords": {"must_have": matched_must, "nice_to_have": matched_nice},
         "missing_keywords": {"must_have": missing_must, "nice_to_have": missing_nice},
         "score": score,
         "suggestions": suggestions,
+        "keywords_fingerprint": keywords_fingerprint(job_keywords),
     }
+    if all_jobs:
+        result["job_scores"] = job_scores
+    return result
@@ -5,8 +5,222 @@ CREATE TABLE IF NOT EXISTS candidates (
     pdf_filename TEXT NOT NULL,
     cv_text TEXT NOT NULL,
     score REAL NOT NULL,
-    matched_keywords TEXT NOT NULL,
-    missing_keywords TEXT NOT NULL,
-    suggestions TEXT NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    status TEXT NOT NULL DEFAULT 'done',
+    error TEXT,
+    source_path TEXT,
+    keywords_fingerprint TEXT,
+    extraction_partial TEXT
+);
+
+-- Dashboard keyset pagination: ORDER BY score DESC, id DESC
+CREATE INDEX IF NOT EXISTS idx_candidates_score ON candidates (score, id);
+CREATE INDEX IF NOT EXISTS idx_candidates_job_score ON candidates (job_id, score, id);
+CREATE INDEX IF NOT EXISTS idx_candidates_source ON candidates (job_id, source_path);
+-- Covers the stale-row count and scan in rescore.py; replaces the
+-- (job_id, keywords_fingerprint) index, which needed a table lookup per row
+DROP INDEX IF EXISTS idx_candidates_fingerprint;
+CREATE INDEX IF NOT EXISTS idx_candidates_job_status_fingerprint
+ON candidates (job_id, status, keywords_fingerprint);
+
+-- Stored PDFs, named by content hash (see upload_store.py). refcount is the
+-- number of candidates pointing at the file and is kept up to date by triggers.
+CREATE TABLE IF NOT EXISTS uploads (
+    filename TEXT PRIMARY KEY,
+    sha256 TEXT,
+    size INTEGER,
+    refcount INTEGER NOT NULL DEFAULT 0,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
+
+CREATE INDEX IF NOT EXISTS idx_uploads_refcount ON uploads (refcount);
+
+CREATE TRIGGER IF NOT EXISTS uploads_ref AFTER INSERT ON candidates BEGIN
+    UPDATE uploads SET refcount = refcount + 1 WHERE filename = new.pdf_filename;
+END;
+
+CREATE TRIGGER IF NOT EXISTS uploads_unref AFTER DELETE ON candidates BEGIN
+    UPDATE uploads SET refcount = refcount - 1 WHERE filename = old.pdf_filename;
+END;
+
+CREATE TRIGGER IF NOT EXISTS uploads_move AFTER UPDATE OF pdf_filename ON candidates BEGIN
+    UPDATE uploads SET refcount = refcount - 1 WHERE filename = old.pdf_filename;
+    UPDATE uploads SET refcount = refcount + 1 WHERE filename = new.pdf_filename;
+END;
+
+-- Job ads (see job_ads.py). Every change bumps job_ads_meta.version, and
+-- edits also bump the row's own version, so caches reload only what changed.
+CREATE TABLE IF NOT EXISTS job_ads (
+    id TEXT PRIMARY KEY,
+    title TEXT NOT NULL,
+    company TEXT NOT NULL,
+    description TEXT NOT NULL DEFAULT '',
+    keywords TEXT NOT NULL,
+    position INTEGER NOT NULL DEFAULT 0,
+    version INTEGER NOT NULL DEFAULT 1,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_job_ads_position ON job_ads (position, id);
+
+CREATE TABLE IF NOT EXISTS job_ads_meta (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    version INTEGER NOT NULL,
+    seeded INTEGER NOT NULL
+);
+
+INSERT OR IGNORE INTO job_ads_meta (id, version, seeded) VALUES (1, 0, 0);
+
+CREATE TRIGGER IF NOT EXISTS job_ads_insert AFTER INSERT ON job_ads BEGIN
+    UPDATE job_ads_meta SET version = version + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS job_ads_update
+AFTER UPDATE OF title, company, description, keywords, position ON job_ads BEGIN
+    UPDATE job_ads SET version = old.version + 1, updated_at = CURRENT_TIMESTAMP WHERE id = new.id;
+    UPDATE job_ads_meta SET version = version + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS job_ads_delete AFTER DELETE ON job_ads BEGIN
+    UPDATE job_ads_meta SET version = version + 1;
+END;
+
+-- Keyword results per candidate (see candidate_keywords.py); tier is 0 for
+-- must-have and 1 for nice-to-have. position is the index within the tier's
+-- matched or missing list, so matched is part of the key
+CREATE TABLE IF NOT EXISTS keywords (
+    id INTEGER PRIMARY KEY,
+    keyword TEXT NOT NULL UNIQUE
+);
+
+CREATE TABLE IF NOT EXISTS candidate_keywords (
+    candidate_id INTEGER NOT NULL REFERENCES candidates (id) ON DELETE CASCADE,
+    tier INTEGER NOT NULL,
+    matched INTEGER NOT NULL,
+    position INTEGER NOT NULL,
+    keyword_id INTEGER NOT NULL REFERENCES keywords (id),
+    PRIMARY KEY (candidate_id, tier, matched, position)
+) WITHOUT ROWID;
+
+-- "Who has keyword X": only matches are indexed
+CREATE INDEX IF NOT EXISTS idx_candidate_keywords_matched
+ON candidate_keywords (keyword_id, candidate_id) WHERE matched = 1;
+
+-- Analytics rollups (see analytics.py), maintained by the triggers below on
+-- every insert, delete and re-score. Only finished scans are counted.
+CREATE TABLE IF NOT EXISTS job_stats (
+    job_id TEXT PRIMARY KEY,
+    candidates INTEGER NOT NULL DEFAULT 0,
+    score_sum REAL NOT NULL DEFAULT 0,
+    revision INTEGER NOT NULL DEFAULT 0
+);
+
+-- bucket is the score decile, 0 (0-9.9%) to 9 (90-100%)
+CREATE TABLE IF NOT EXISTS job_score_histogram (
+    job_id TEXT NOT NULL,
+    bucket INTEGER NOT NULL,
+    count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (job_id, bucket)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS keyword_stats (
+    job_id TEXT NOT NULL,
+    keyword_id INTEGER NOT NULL,
+    tier INTEGER NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0,
+    misses INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (job_id, tier, keyword_id)
+) WITHOUT ROWID;
+
+CREATE TRIGGER IF NOT EXISTS stats_candidate_add
+AFTER INSERT ON candidates WHEN new.status = 'done' BEGIN
+    INSERT INTO job_stats (job_id, candidates, score_sum, revision)
+    VALUES (new.job_id, 1, new.score, 1)
+    ON CONFLICT (job_id) DO UPDATE SET candidates = candidates + 1,
+        score_sum = score_sum + excluded.score_sum, revision = revision + 1;
+    INSERT INTO job_score_histogram (job_id, bucket, count)
+    VALUES (new.job_id, MIN(CAST(new.score / 10 AS INTEGER), 9), 1)
+    ON CONFLICT (job_id, bucket) DO UPDATE SET count = count + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS stats_candidate_remove
+AFTER DELETE ON candidates WHEN old.status = 'done' BEGIN
+    UPDATE job_stats SET candidates = candidates - 1, score_sum = score_sum - old.score,
+        revision = revision + 1 WHERE job_id = old.job_id;
+    UPDATE job_score_histogram SET count = count - 1
+    WHERE job_id = old.job_id AND bucket = MIN(CAST(old.score / 10 AS INTEGER), 9);
+END;
+
+-- A re-score or finished scan is a remove of the old values plus an add
+CREATE TRIGGER IF NOT EXISTS stats_candidate_rescore_old
+AFTER UPDATE OF score, status ON candidates WHEN old.status = 'done' BEGIN
+    UPDATE job_stats SET candidates = candidates - 1, score_sum = score_sum - old.score,
+        revision = revision + 1 WHERE job_id = old.job_id;
+    UPDATE job_score_histogram SET count = count - 1
+    WHERE job_id = old.job_id AND bucket = MIN(CAST(old.score / 10 AS INTEGER), 9);
+END;
+
+CREATE TRIGGER IF NOT EXISTS stats_candidate_rescore_new
+AFTER UPDATE OF score, status ON candidates WHEN new.status = 'done' BEGIN
+    INSERT INTO job_stats (job_id, candidates, score_sum, revision)
+    VALUES (new.job_id, 1, new.score, 1)
+    ON CONFLICT (job_id) DO UPDATE SET candidates = candidates + 1,
+        score_sum = score_sum + excluded.score_sum, revision = revision + 1;
+    INSERT INTO job_score_histogram (job_id, bucket, count)
+    VALUES (new.job_id, MIN(CAST(new.score / 10 AS INTEGER), 9), 1)
+    ON CONFLICT (job_id, bucket) DO UPDATE SET count = count + 1;
+END;
+
+-- Remove keyword rows while the candidate (and its job_id) still exists,
+-- so stats_keyword_remove can find the job; the cascade then has no work.
+CREATE TRIGGER IF NOT EXISTS candidate_keywords_cleanup
+BEFORE DELETE ON candidates BEGIN
+    DELETE FROM candidate_keywords WHERE candidate_id = old.id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS stats_keyword_add AFTER INSERT ON candidate_keywords BEGIN
+    INSERT INTO keyword_stats (job_id, keyword_id, tier, hits, misses)
+    SELECT job_id, new.keyword_id, new.tier, new.matched, 1 - new.matched
+    FROM candidates WHERE id = new.candidate_id
+    ON CONFLICT (job_id, tier, keyword_id) DO UPDATE SET
+        hits = hits + excluded.hits, misses = misses + excluded.misses;
+END;
+
+CREATE TRIGGER IF NOT EXISTS stats_keyword_remove AFTER DELETE ON candidate_keywords BEGIN
+    UPDATE keyword_stats SET hits = hits - old.matched, misses = misses - (1 - old.matched)
+    WHERE job_id = (SELECT job_id FROM candidates WHERE id = old.candidate_id)
+      AND tier = old.tier AND keyword_id = old.keyword_id;
+END;
+
+-- Score of every candidate against every job ad (see score_matrix.py)
+CREATE TABLE IF NOT EXISTS candidate_job_scores (
+    candidate_id INTEGER NOT NULL REFERENCES candidates (id) ON DELETE CASCADE,
+    job_id TEXT NOT NULL,
+    score REAL NOT NULL,
+    matched INTEGER NOT NULL,
+    total INTEGER NOT NULL,
+    keywords_fingerprint TEXT NOT NULL,
+    PRIMARY KEY (candidate_id, job_id)
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS idx_job_scores_job ON candidate_job_scores (job_id, score);
+
+-- Full-text index over candidate names and CV text, kept in sync by triggers
+CREATE VIRTUAL TABLE IF NOT EXISTS candidates_fts USING fts5(
+    name, cv_text, content='candidates', content_rowid='id'
+);
+
+CREATE TRIGGER IF NOT EXISTS candidates_fts_insert AFTER INSERT ON candidates BEGIN
+    INSERT INTO candidates_fts (rowid, name, cv_text) VALUES (new.id, new.name, new.cv_text);
+END;
+
+CREATE TRIGGER IF NOT EXISTS candidates_fts_delete AFTER DELETE ON candidates BEGIN
+    INSERT INTO candidates_fts (candidates_fts, rowid, name, cv_text)
+    VALUES ('delete', old.id, old.name, old.cv_text);
+END;
+
+CREATE TRIGGER IF NOT EXISTS candidates_fts_update AFTER UPDATE OF name, cv_text ON candidates BEGIN
+    INSERT INTO candidates_fts (candidates_fts, rowid, name, cv_text)
+    VALUES ('delete', old.id, old.name, old.cv_text);
+    INSERT INTO candidates_fts (rowid, name, cv_text) VALUES (new.id, new.name, new.cv_text);
+END;
@@ -0,0 +1,145 @@
+"""Per-job score matrix: how well each candidate fits every open role.
+
+    python score_matrix.py           # fill in missing or outdated rows
+    python score_matrix.py --db other.db
+
+Scans score the CV against all job ads in the same matching pass as the job
+applied for (see scanner.score_all_jobs) and store one row per (candidate,
+job) in candidate_job_scores. Rows remember the keyword fingerprint they were
+scored with; backfill() recomputes rows for candidates scored before this
+table existed, imported in bulk, or scored against keywords that have since
+changed, from the stored cv_text.
+"""
+
+import argparse
+import os
+import time
+
+import db
+from job_ads import get_job_ads
+from matcher import keywords_fingerprint
+from scanner import score_all_jobs
+
+# Score every CV against all job ads; "0" only scores the job applied for
+ENABLED = os.environ.get("SCORE_ALL_JOBS", "1") != "0"
+BATCH_SIZE = 500
+BEST_MATCHES = 3
+
+
+def all_job_keywords(job_ads=None):
+    """{job_id: keywords} for every job ad, or None when the matrix is disabled."""
+    if not ENABLED:
+        return None
+    job_ads = get_job_ads() if job_ads is None else job_ads
+    return {job_id: job_ad["keywords"] for job_id, job_ad in job_ads.items()}
+
+
+def store(conn, candidate_id, job_scores):
+    """Replace a candidate's matrix row for each job in job_scores (no commit)."""
+    conn.executemany(
+        """INSERT OR REPLACE INTO candidate_job_scores
+           (candidate_id, job_id, score, matched, total, keywords_fingerprint)
+           VALUES (?, ?, ?, ?, ?, ?)""",
+        [
+            (candidate_id, job_id, s["score"], s["matched"], s["total"], s["keywords_fingerprint"])
+            for job_id, s in job_scores.items()
+        ],
+    )
+
+
+def for_candidate(conn, candidate_id):
+    """All of a candidate's job scores, best first."""
+    return conn.execute(
+        """SELECT job_id, score, matched, total FROM candidate_job_scores
+           WHERE candidate_id = ? ORDER BY score DESC, job_id""",
+        (candidate_id,),
+    ).fetchall()
+
+
+def best_jobs(conn, candidate_ids):
+    """{candidate_id: (job_id, score)} of each candidate's best-scoring job."""
+    if not candidate_ids:
+        return {}
+    placeholders = ",".join("?" * len(candidate_ids))
+    # SQLite takes the bare job_id column from the row holding MAX(score)
+    rows = conn.execute(
+        f"""SELECT candidate_id, job_id, MAX(score) AS score FROM candidate_job_scores
+            WHERE candidate_id IN ({placeholders}) GROUP BY candidate_id""",
+        list(candidate_ids),
+    )
+    return {row["candidate_id"]: (row["job_id"], row["score"]) for row in rows}
+
+
+def backfill(conn, job_ads=None, batch_size=BATCH_SIZE, progress=None):
+    """Score done candidates against any job they lack an up-to-date row for.
+
+    Candidates are read in id-ordered batches, one transaction each, and only
+    matched against their missing or outdated jobs, so editing one job ad
+    re-matches the stored CVs against that job alone. progress(candidates)
+    is called after each batch. Returns the number of candidates updated.
+    """
+    all_jobs = {job_id: job_ad["keywords"] for job_id, job_ad in (job_ads or get_job_ads()).items()}
+    if not all_jobs:
+        return 0
+    current = [(job_id, keywords_fingerprint(kw)) for job_id, kw in all_jobs.items()]
+    job_ids = [job_id for job_id, _ in current]
+    values = ",".join("(?, ?)" for _ in current)
+    current_params = [value for pair in current for value in pair]
+
+    with conn:
+        conn.execute(
+            f"DELETE FROM candidate_job_scores WHERE job_id NOT IN ({','.join('?' * len(job_ids))})",
+            job_ids,
+        )
+
+    last_id = 0
+    total = 0
+    while True:
+        rows = conn.execute(
+            f"""SELECT id, cv_text FROM candidates c
+                WHERE status = 'done' AND id > ? AND (
+                    SELECT COUNT(*) FROM candidate_job_scores s
+                    WHERE s.candidate_id = c.id
+                      AND (s.job_id, s.keywords_fingerprint) IN (VALUES {values})
+                ) < ?
+                ORDER BY id LIMIT ?""",
+            [last_id, *current_params, len(current), batch_size],
+        ).fetchall()
+        if not rows:
+            return total
+        up_to_date = {}
+        for row in conn.execute(
+            f"""SELECT candidate_id, job_id FROM candidate_job_scores
+                WHERE candidate_id IN ({','.join('?' * len(rows))})
+                  AND (job_id, keywords_fingerprint) IN (VALUES {values})""",
+            [row["id"] for row in rows] + current_params,
+        ):
+            up_to_date.setdefault(row["candidate_id"], set()).add(row["job_id"])
+        with conn:
+            for row in rows:
+                done = up_to_date.get(row["id"], set())
+                stale = {job_id: kw for job_id, kw in all_jobs.items() if job_id not in done}
+                store(conn, row["id"], score_all_jobs(row["cv_text"], stale))
+        total += len(rows)
+        last_id = rows[-1]["id"]
+        if progress:
+            progress(total)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fill in the candidate x job score matrix.")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="rows per transaction")
+    parser.add_argument("--db", default=None, help="SQLite database path")
+    args = parser.parse_args(argv)
+
+    db.init_db(args.db)
+    conn = db.connect(args.db)
+    started = time.monotonic()
+    count = backfill(conn, get_job_ads(args.db), args.batch_size,
+                     lambda done: print(f"{done} candidates scored", flush=True))
+    conn.close()
+    print(f"Scored {count} candidates against all jobs in {time.monotonic() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
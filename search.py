@@ -0,0 +1,113 @@
+"""Ranked full-text search over stored CVs (SQLite FTS5).
+
+    python search.py "kubernetes AND go"
+    python search.py --rebuild      # re-index every candidate
+
+Queries use FTS5 syntax: bare terms are ANDed, and AND / OR / NOT, "exact
+phrases" and prefix* terms are supported. Results are ordered by BM25 with
+name matches weighted above CV text matches.
+"""
+
+import argparse
+import sqlite3
+
+from markupsafe import Markup, escape
+
+import db
+
+PAGE_SIZE = 20
+
+# bm25() column weights for (name, cv_text)
+NAME_WEIGHT = 5.0
+TEXT_WEIGHT = 1.0
+
+# Private-use markers placed by snippet() and turned into <mark> after escaping
+_MARK_OPEN = "\ue000"
+_MARK_CLOSE = "\ue001"
+
+
+class SearchError(ValueError):
+    """The query could not be parsed as an FTS5 expression."""
+
+
+def highlight_snippet(snippet):
+    """Escape a raw snippet and wrap the matched terms in <mark> tags."""
+    html = str(escape(snippet))
+    return Markup(html.replace(_MARK_OPEN, "<mark>").replace(_MARK_CLOSE, "</mark>"))
+
+
+def search_candidates(conn, query, job_id=None, page=1, page_size=PAGE_SIZE):
+    """Return (rows, has_next) for one page of candidates matching query.
+
+    Each row has id, name, job_id, score, created_at and an HTML snippet.
+    """
+    sql = f"""SELECT c.id, c.name, c.job_id, c.score, c.created_at,
+                     snippet(candidates_fts, 1, '{_MARK_OPEN}', '{_MARK_CLOSE}', ' … ', 16) AS snippet
+              FROM candidates_fts
+              JOIN candidates c ON c.id = candidates_fts.rowid
+              WHERE candidates_fts MATCH ?"""
+    params = [query]
+    if job_id:
+        sql += " AND c.job_id = ?"
+        params.append(job_id)
+    sql += f" ORDER BY bm25(candidates_fts, {NAME_WEIGHT}, {TEXT_WEIGHT}) LIMIT ? OFFSET ?"
+    params.extend([page_size + 1, (page - 1) * page_size])
+
+    try:
+        rows = conn.execute(sql, params).fetchall()
+    except sqlite3.OperationalError as e:
+        raise SearchError(str(e)) from e
+
+    results = [
+        {
+            "id": row["id"],
+            "name": row["name"],
+            "job_id": row["job_id"],
+            "score": row["score"],
+            "created_at": row["created_at"],
+            "snippet": highlight_snippet(row["snippet"]),
+        }
+        for row in rows[:page_size]
+    ]
+    return results, len(rows) > page_size
+
+
+def rebuild_index(conn):
+    """Re-index every candidate, e.g. after restoring a database backup."""
+    with conn:
+        conn.execute("INSERT INTO candidates_fts (candidates_fts) VALUES ('rebuild')")
+        conn.execute("INSERT INTO candidates_fts (candidates_fts) VALUES ('optimize')")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Search stored CVs.")
+    parser.add_argument("query", nargs="?", help="FTS5 query, e.g. 'kubernetes AND go'")
+    parser.add_argument("--job", help="only candidates for this job id")
+    parser.add_argument("--page", type=int, default=1)
+    parser.add_argument("--db", default=None, help="SQLite database path")
+    parser.add_argument("--rebuild", action="store_true", help="rebuild the full-text index")
+    args = parser.parse_args(argv)
+
+    db.init_db(args.db)
+    conn = db.connect(args.db)
+    if args.rebuild:
+        rebuild_index(conn)
+        count = conn.execute("SELECT COUNT(*) FROM candidates").fetchone()[0]
+        print(f"Indexed {count} candidates")
+    if args.query:
+        try:
+            rows, has_next = search_candidates(conn, args.query, args.job, args.page)
+        except SearchError as e:
+            parser.error(f"invalid query: {e}")
+        for row in rows:
+            snippet = row["snippet"].replace("<mark>", "[").replace("</mark>", "]")
+            print(f"{row['id']:>6}  {row['score']:5.1f}%  {row['name']}: {snippet}")
+        if has_next:
+            print(f"(more results: --page {args.page + 1})")
+    elif not args.rebuild:
+        parser.error("give a query or --rebuild")
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
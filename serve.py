@@ -0,0 +1,271 @@
+"""Production server: pre-forked worker processes sharing one listening socket.
+
+    python serve.py                              # 4 workers on 127.0.0.1:8000
+    python serve.py --host 0.0.0.0 --port 8080 --workers 8 --threads 16
+    python serve.py --gunicorn                   # same preload, served by gunicorn
+
+The parent process imports the app (migrating the schema once), loads the job
+ads and compiles every job's matchers before forking, so workers start with
+them already in memory and share those pages copy-on-write. Each worker
+serves the inherited socket with werkzeug's threaded WSGI server.
+
+The warmed matchers serve what runs in the web workers themselves:
+highlighting, admin re-scoring and, with SCAN_WORKERS=0, inline scans. The
+scan pool (see below) is spawned, so its processes import the app modules
+afresh and compile their own matchers on their first scan.
+
+SIGTERM or SIGINT shuts down gracefully: the parent forwards the signal,
+workers stop accepting, finish in-flight requests and queued scans, and exit.
+Workers still running after --graceful-timeout seconds are killed. A worker
+that dies on its own is replaced.
+
+Each worker runs its own scan pool (see scan_queue.SCAN_WORKERS). Scans left
+pending by a previous run are resumed by the first worker only. Inline scans
+(SCAN_WORKERS=0) share extraction.EXTRACT_WORKERS out between the workers.
+
+Metrics are kept per process, so /metrics reports whichever worker answered
+the scrape; successive scrapes may come from different workers.
+"""
+
+import argparse
+import logging
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+
+from werkzeug.serving import make_server
+
+import db
+import extraction
+import scan_queue
+import score_matrix
+from job_ads import get_job_ad, get_job_ads, get_store
+from matcher import get_matcher, get_multi_matcher
+
+DEFAULT_WORKERS = 4
+DEFAULT_THREADS = 8
+GRACEFUL_TIMEOUT = 30
+# Wait this long before replacing a worker that died, so a crash loop does not spin
+RESPAWN_DELAY = 1.0
+
+log = logging.getLogger("serve")
+
+
+def preload():
+    """Import the app and warm the job ads and matchers the web workers use."""
+    from app import DATABASE, app
+
+    get_store().refresh(force=True)
+    job_ads = get_job_ads()
+    for job_ad in job_ads.values():
+        get_matcher(job_ad["keywords"])
+    all_jobs = score_matrix.all_job_keywords(job_ads)
+    if all_jobs:
+        # The one all-jobs matcher every scan and backfill uses
+        get_multi_matcher(all_jobs.values())
+    # Connections must not cross fork(); each worker opens its own
+    db.get_pool(DATABASE).close()
+    return app, DATABASE, len(job_ads)
+
+
+def bind(host, port, backlog=128):
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def limit_threads(server, threads):
+    """Cap a threaded server's concurrent requests; accepting waits while all are busy."""
+    slots = threading.BoundedSemaphore(threads)
+    start_thread = server.process_request
+    handle = server.process_request_thread
+
+    def process_request(request, client_address):
+        slots.acquire()
+        try:
+            start_thread(request, client_address)
+        except BaseException:
+            slots.release()
+            raise
+
+    def process_request_thread(request, client_address):
+        try:
+            handle(request, client_address)
+        finally:
+            slots.release()
+
+    server.process_request = process_request
+    server.process_request_thread = process_request_thread
+
+
+def run_worker(app, database, sock, threads, resume):
+    """Serve requests on the shared socket until SIGTERM/SIGINT, then drain."""
+    server = make_server(*sock.getsockname()[:2], app, threaded=True, fd=sock.fileno())
+    # Let server_close() wait for in-flight requests instead of abandoning them
+    server.daemon_threads = False
+    server.block_on_close = True
+    limit_threads(server, threads)
+
+    def stop(signum, frame):
+        # shutdown() waits for serve_forever() to return, so not from this thread
+        threading.Thread(target=server.shutdown, daemon=True).start()
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    if resume:
+        count = scan_queue.resume_pending(
+            app.config["UPLOAD_FOLDER"], get_job_ad, database, score_matrix.all_job_keywords()
+        )
+        if count:
+            log.info("Resumed %d pending scans", count)
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        scan_queue.shutdown()
+
+
+class Arbiter:
+    """Forks the workers, replaces ones that die, and stops them all on a signal."""
+
+    def __init__(self, app, database, sock, workers, threads, graceful_timeout):
+        self.app = app
+        self.database = database
+        self.sock = sock
+        self.workers = workers
+        self.threads = threads
+        self.graceful_timeout = graceful_timeout
+        self.children = {}
+        self.stopping = False
+
+    def spawn(self, index, resume=False):
+        pid = os.fork()
+        if pid:
+            self.children[pid] = index
+            return
+        code = 0
+        try:
+            run_worker(self.app, self.database, self.sock, self.threads, resume)
+        except Exception:
+            log.exception("Worker %d crashed", os.getpid())
+            code = 1
+        finally:
+            # Skip the parent's atexit handlers and buffered state
+            os._exit(code)
+
+    def stop(self, signum, frame):
+        self.stopping = True
+
+    def run(self):
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        for index in range(self.workers):
+            self.spawn(index, resume=index == 0)
+
+        while not self.stopping:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+            if pid and pid in self.children:
+                index = self.children.pop(pid)
+                log.warning("Worker %d exited with status %d; replacing it",
+                            pid, os.waitstatus_to_exitcode(status))
+                time.sleep(RESPAWN_DELAY)
+                if not self.stopping:
+                    self.spawn(index)
+                continue
+            time.sleep(0.2)
+        self.shutdown()
+
+    def shutdown(self):
+        log.info("Stopping %d workers", len(self.children))
+        for pid in self.children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        deadline = time.monotonic() + self.graceful_timeout
+        while self.children and time.monotonic() < deadline:
+            pid, _ = os.waitpid(-1, os.WNOHANG)
+            if pid:
+                self.children.pop(pid, None)
+            else:
+                time.sleep(0.1)
+        for pid in self.children:
+            log.warning("Worker %d did not stop in time; killing it", pid)
+            os.kill(pid, signal.SIGKILL)
+            os.waitpid(pid, 0)
+        self.children = {}
+
+
+def run_gunicorn(app, database, host, port, workers, threads, graceful_timeout):
+    """Serve the preloaded app with gunicorn (optional dependency)."""
+    try:
+        from gunicorn.app.base import BaseApplication
+    except ImportError:
+        sys.exit("gunicorn is not installed: pip install gunicorn")
+
+    def post_worker_init(worker):
+        # Worker ages count up from 1 across the arbiter's lifetime
+        if worker.age == 1:
+            scan_queue.resume_pending(
+                app.config["UPLOAD_FOLDER"], get_job_ad, database, score_matrix.all_job_keywords()
+            )
+
+    def worker_exit(server, worker):
+        scan_queue.shutdown()
+
+    class Application(BaseApplication):
+        def load_config(self):
+            self.cfg.set("bind", f"[{host}]:{port}" if ":" in host else f"{host}:{port}")
+            self.cfg.set("workers", workers)
+            self.cfg.set("threads", threads)
+            self.cfg.set("graceful_timeout", graceful_timeout)
+            self.cfg.set("preload_app", True)
+            self.cfg.set("post_worker_init", post_worker_init)
+            self.cfg.set("worker_exit", worker_exit)
+
+        def load(self):
+            return app
+
+    Application().run()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the app with pre-forked worker processes.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="worker processes")
+    parser.add_argument("--threads", type=int, default=DEFAULT_THREADS,
+                        help="concurrent requests per worker")
+    parser.add_argument("--graceful-timeout", type=float, default=GRACEFUL_TIMEOUT,
+                        help="seconds workers get to finish in-flight work on shutdown")
+    parser.add_argument("--gunicorn", action="store_true", help="serve with gunicorn instead")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(process)d] %(message)s")
+    started = time.monotonic()
+    app, database, job_count = preload()
+    log.info("Preloaded %d job ads in %.2fs", job_count, time.monotonic() - started)
+
+    # Each worker would otherwise start its own extraction pool of that size
+    extraction.EXTRACT_WORKERS = max(1, extraction.EXTRACT_WORKERS // args.workers)
+    if args.gunicorn:
+        run_gunicorn(
+            app, database, args.host, args.port, args.workers, args.threads, args.graceful_timeout
+        )
+        return
+
+    sock = bind(args.host, args.port)
+    log.info("Listening on http://%s:%d with %d workers", args.host, args.port, args.workers)
+    Arbiter(app, database, sock, args.workers, args.threads, args.graceful_timeout).run()
+    sock.close()
+
+
+if __name__ == "__main__":
+    main()
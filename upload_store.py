@@ -0,0 +1,147 @@
+"""Content-addressed storage for uploaded CV PDFs.
+
+Upload bodies are streamed in chunks to a temp file under
+uploads/.incoming while their SHA-256 is computed (see HashingFile), then
+moved into place as uploads/<sha256>.pdf with an atomic rename. Identical
+bytes are stored once.
+
+The uploads table holds one row per stored file. Triggers on candidates
+keep its refcount equal to the number of candidates pointing at the file.
+collect_garbage() removes files nobody references any more. Placing and
+collecting both run under SQLite's write lock, so a collection can never
+delete a file that a concurrent upload is about to reference. A file is
+moved into place before its transaction commits; if that transaction rolls
+back (or the process dies first), the file is left without an uploads row,
+and the next collection removes it.
+"""
+
+import hashlib
+import os
+import re
+import shutil
+import tempfile
+import time
+
+INCOMING_DIR = ".incoming"
+CHUNK_SIZE = 64 * 1024
+# Temp files older than this are leftovers of aborted uploads
+STALE_INCOMING_SECONDS = 3600
+# Only content-addressed names are ever swept, never other files in the folder
+STORED_NAME_RE = re.compile(r"[0-9a-f]{64}\.pdf")
+
+
+class HashingFile:
+    """A temp file that hashes everything written to it.
+
+    Used as the stream behind uploaded files, so the digest is ready as soon
+    as the request body has been read, without a second pass over the data.
+    """
+
+    def __init__(self, upload_folder):
+        incoming = os.path.join(upload_folder, INCOMING_DIR)
+        os.makedirs(incoming, exist_ok=True)
+        self.file = tempfile.NamedTemporaryFile(dir=incoming, suffix=".part", delete=False)
+        self.path = self.file.name
+        self.size = 0
+        self._sha256 = hashlib.sha256()
+
+    def write(self, data):
+        self._sha256.update(data)
+        self.size += len(data)
+        return self.file.write(data)
+
+    def hexdigest(self):
+        return self._sha256.hexdigest()
+
+    def discard(self):
+        """Close and delete the temp file, unless it was already placed."""
+        self.file.close()
+        if self.path and os.path.exists(self.path):
+            os.remove(self.path)
+        self.path = None
+
+    def __getattr__(self, name):
+        # read, seek, tell, flush, close... go to the underlying file
+        return getattr(self.file, name)
+
+
+def save_stream(stream, upload_folder):
+    """Copy a readable binary stream into a new HashingFile, chunk by chunk."""
+    incoming = HashingFile(upload_folder)
+    try:
+        shutil.copyfileobj(stream, incoming, CHUNK_SIZE)
+        incoming.flush()
+    except Exception:
+        incoming.discard()
+        raise
+    return incoming
+
+
+def copy_to_incoming(src_path, upload_folder):
+    with open(src_path, "rb") as src:
+        return save_stream(src, upload_folder)
+
+
+def stored_filename(digest):
+    return f"{digest}.pdf"
+
+
+def place(conn, incoming, upload_folder):
+    """Register a finished HashingFile and move it into place (see place_file)."""
+    incoming.file.close()
+    filename = place_file(conn, incoming.path, incoming.hexdigest(), incoming.size, upload_folder)
+    incoming.path = None
+    return filename
+
+
+def place_file(conn, path, digest, size, upload_folder):
+    """Register a hashed temp file and move it into place; returns its stored filename.
+
+    Runs inside the caller's transaction, which should go on to insert the
+    candidate row(s) referencing the file before committing. The temp file
+    is consumed either way.
+    """
+    filename = stored_filename(digest)
+    # Taking the write lock first keeps collect_garbage() out until commit
+    conn.execute(
+        "INSERT OR IGNORE INTO uploads (filename, sha256, size) VALUES (?, ?, ?)",
+        (filename, digest, size),
+    )
+    target = os.path.join(upload_folder, filename)
+    if os.path.exists(target):
+        os.remove(path)
+    else:
+        os.replace(path, target)
+    return filename
+
+
+def collect_garbage(conn, upload_folder):
+    """Delete unreferenced uploads and stale temp files. Returns files removed."""
+    removed = 0
+    with conn:
+        rows = conn.execute(
+            "DELETE FROM uploads WHERE refcount <= 0 RETURNING filename"
+        ).fetchall()
+        for row in rows:
+            path = os.path.join(upload_folder, row["filename"])
+            if os.path.exists(path):
+                os.remove(path)
+                removed += 1
+        # Files placed by transactions that never committed. The DELETE above
+        # holds the write lock, so no placement is in progress.
+        registered = {filename for filename, in conn.execute("SELECT filename FROM uploads")}
+        if os.path.isdir(upload_folder):
+            for entry in os.scandir(upload_folder):
+                if STORED_NAME_RE.fullmatch(entry.name) and entry.name not in registered:
+                    os.remove(entry.path)
+                    removed += 1
+
+    incoming = os.path.join(upload_folder, INCOMING_DIR)
+    if os.path.isdir(incoming):
+        cutoff = time.time() - STALE_INCOMING_SECONDS
+        for entry in os.scandir(incoming):
+            if entry.stat().st_mtime < cutoff:
+                os.remove(entry.path)
+                removed += 1
+    return removed
+